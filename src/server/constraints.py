@@ -11,7 +11,7 @@ Constraints are attached to symbols and validated against code changes.
 """
 
 import json
-import uuid
+import secrets
 from typing import Optional
 from database import ShadowDB
 
@@ -43,7 +43,7 @@ class ConstraintValidator:
             Constraint node ID
         """
         # Use unique constraint ID to avoid collisions
-        constraint_id = f"constraint:{uuid.uuid4().hex[:8]}"
+        constraint_id = f"constraint:{secrets.token_hex(4)}"
 
         # Store constraint as a node FIRST
         constraint_content = json.dumps({
@@ -62,6 +62,20 @@ class ConstraintValidator:
 
         return constraint_id
 
+    @staticmethod
+    def _parse_constraint(constraint_id: str, raw: str | None) -> dict:
+        """REQUIREMENT node content → constraint dict. Non-JSON content is a plain RULE."""
+        try:
+            content = json.loads(raw) if raw else {}
+        except json.JSONDecodeError:
+            return {"id": constraint_id, "type": "RULE", "rule": raw or "", "severity": "warning"}
+        return {
+            "id": constraint_id,
+            "type": content.get("type", "RULE"),
+            "rule": content.get("rule", ""),
+            "severity": content.get("severity", "warning"),
+        }
+
     def get_constraints(self, file_path: str, symbol_name: str) -> list[dict]:
         """Get all constraints for a symbol."""
         code_node_id = f"code:{file_path}:{symbol_name}"
@@ -76,25 +90,7 @@ class ConstraintValidator:
             (code_node_id,),
         )
 
-        constraints = []
-        for row in cursor.fetchall():
-            try:
-                content = json.loads(row[1]) if row[1] else {}
-                constraints.append({
-                    "id": row[0],
-                    "type": content.get("type", "RULE"),
-                    "rule": content.get("rule", ""),
-                    "severity": content.get("severity", "warning"),
-                })
-            except json.JSONDecodeError:
-                constraints.append({
-                    "id": row[0],
-                    "type": "RULE",
-                    "rule": row[1] or "",
-                    "severity": "warning",
-                })
-
-        return constraints
+        return [self._parse_constraint(row[0], row[1]) for row in cursor]
 
     def validate_symbol(self, file_path: str, symbol_name: str) -> list[dict]:
         """Validate a symbol against its constraints.
@@ -102,17 +98,26 @@ class ConstraintValidator:
         Returns list of violations with (severity, message).
         This is a basic implementation; real validation would check code patterns.
         """
-        constraints = self.get_constraints(file_path, symbol_name)
-        violations = []
-
-        # Get the code node
         code_node_id = f"code:{file_path}:{symbol_name}"
-        code_node = self.db.get_node(code_node_id)
 
-        if not code_node:
+        # The code node and its constraints in one query: one row per constraint,
+        # or a single row with NULL constraint columns when there are none
+        rows = self.db.conn.execute(
+            """
+            SELECT c.content, r.id, r.content FROM nodes c
+            LEFT JOIN edges e ON e.source_id = c.id AND e.relation = 'REQUIRED_BY'
+            LEFT JOIN nodes r ON r.id = e.target_id AND r.type = 'REQUIREMENT'
+            WHERE c.id = ?
+            """,
+            (code_node_id,),
+        ).fetchall()
+
+        if not rows:
             return [{"severity": "error", "message": f"Symbol not found: {symbol_name}"}]
 
-        code_content = code_node.get("content", "")
+        code_content = rows[0][0] or ""
+        constraints = [self._parse_constraint(row[1], row[2]) for row in rows if row[1] is not None]
+        violations = []
 
         for constraint in constraints:
             # Simple pattern matching (real validation would be more sophisticated)
@@ -164,22 +169,4 @@ class ConstraintValidator:
             "SELECT id, content FROM nodes WHERE type = 'REQUIREMENT'"
         )
 
-        constraints = []
-        for row in cursor.fetchall():
-            try:
-                content = json.loads(row[1]) if row[1] else {}
-                constraints.append({
-                    "id": row[0],
-                    "type": content.get("type", "RULE"),
-                    "rule": content.get("rule", ""),
-                    "severity": content.get("severity", "warning"),
-                })
-            except json.JSONDecodeError:
-                constraints.append({
-                    "id": row[0],
-                    "type": "RULE",
-                    "rule": row[1] or "",
-                    "severity": "warning",
-                })
-
-        return constraints
+        return [self._parse_constraint(row[0], row[1]) for row in cursor]
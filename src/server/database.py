@@ -1,6 +1,6 @@
 import os
 import sqlite3
-import uuid
+import secrets
 from pathlib import Path
 
 try:
@@ -21,6 +21,13 @@ class ShadowDB:
         self.conn = sqlite3.connect(self.db_path)
         self.conn.row_factory = sqlite3.Row
         self.conn.execute("PRAGMA journal_mode=WAL")
+        # WAL only needs to sync at checkpoints; NORMAL drops the per-commit fsync
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+        # One long-lived connection serves every tool call: read pages straight from
+        # the OS page cache (256 MiB mmap) and keep up to 64 MiB of them hot in SQLite
+        self.conn.execute("PRAGMA mmap_size=268435456")
+        self.conn.execute("PRAGMA cache_size=-65536")
         self.conn.execute("PRAGMA foreign_keys=ON")
 
         # DuckDB for analytical dimension queries
@@ -72,7 +79,7 @@ class ShadowDB:
             self.conn.execute(
                 "INSERT INTO nodes (id, type, content) VALUES (?, ?, ?) "
                 "ON CONFLICT DO NOTHING",
-                (f"_migration_test_{uuid.uuid4().hex[:8]}", "FOLDER", "test")
+                (f"_migration_test_{secrets.token_hex(4)}", "FOLDER", "test")
             )
             self.conn.execute(
                 "DELETE FROM nodes WHERE id LIKE '_migration_test%'"
@@ -94,7 +101,9 @@ class ShadowDB:
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             """)
-            self.conn.execute("INSERT INTO nodes_backup SELECT * FROM nodes")
+            self.conn.execute(
+                "INSERT INTO nodes_backup SELECT id, type, content, vector, path, created_at FROM nodes"
+            )
 
             # Drop old table (will cascade delete anchors due to FK)
             self.conn.execute("DROP TABLE nodes")
@@ -112,10 +121,35 @@ class ShadowDB:
             self.conn.execute("PRAGMA foreign_keys=ON")
             self.conn.commit()
 
+        # Add symbol_suffix generated column if missing (VIRTUAL, so no rewrite of existing rows)
+        cursor = self.conn.execute("PRAGMA table_xinfo(nodes)")
+        if "symbol_suffix" not in {row[1] for row in cursor.fetchall()}:
+            self.conn.execute(
+                "ALTER TABLE nodes ADD COLUMN symbol_suffix TEXT GENERATED ALWAYS AS "
+                "(substr(id, length(rtrim(id, replace(id, ':', ''))) + 1)) VIRTUAL"
+            )
+            self.conn.commit()
+
+        # Add anchors.end_line if missing (edit() falls back to an indentation scan while NULL)
+        cursor = self.conn.execute("PRAGMA table_info(anchors)")
+        anchor_columns = {row[1] for row in cursor.fetchall()}
+        if anchor_columns and "end_line" not in anchor_columns:
+            self.conn.execute("ALTER TABLE anchors ADD COLUMN end_line INTEGER")
+            self.conn.commit()
+
         # Add indexes if they don't exist (safe due to IF NOT EXISTS)
         indexes = [
-            "CREATE INDEX IF NOT EXISTS idx_nodes_type ON nodes(type)",
+            "CREATE INDEX IF NOT EXISTS idx_nodes_type_id ON nodes(type, id)",
+            "CREATE INDEX IF NOT EXISTS idx_nodes_type_recent ON nodes(type, created_at DESC, id)",
             "CREATE INDEX IF NOT EXISTS idx_nodes_path ON nodes(path)",
+            # Superseded by the primary key and idx_edges_src_rel / idx_edges_tgt_rel
+            "DROP INDEX IF EXISTS idx_edges_source",
+            "DROP INDEX IF EXISTS idx_edges_target",
+            # Superseded by idx_nodes_type_id / idx_nodes_type_recent
+            "DROP INDEX IF EXISTS idx_nodes_type",
+            "DROP INDEX IF EXISTS idx_nodes_type_created",
+            # Superseded by idx_nodes_symbol_nocase (symbol lookups ignore case)
+            "DROP INDEX IF EXISTS idx_nodes_symbol_suffix",
         ]
         for index_sql in indexes:
             try:
@@ -124,13 +158,52 @@ class ShadowDB:
             except sqlite3.OperationalError:
                 pass  # Index already exists
 
+    # Columns handed out by the node getters: everything but the generated
+    # symbol_suffix, which only exists to back an index
+    _NODE_COLUMNS = "id, type, content, vector, path, created_at"
+
+    # Update in place rather than INSERT OR REPLACE: REPLACE deletes the old row first,
+    # which cascades away every edge and anchor attached to the node.
+    _UPSERT_NODE_SQL = """
+        INSERT INTO nodes (id, type, content, path) VALUES (?, ?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET
+            type = excluded.type,
+            content = excluded.content,
+            path = excluded.path,
+            created_at = CURRENT_TIMESTAMP
+    """
+
     def upsert_node(self, node_id: str, node_type: str, content: str, path: str = None) -> None:
-        self.conn.execute(
-            "INSERT OR REPLACE INTO nodes (id, type, content, path) VALUES (?, ?, ?, ?)",
-            (node_id, node_type, content, path),
-        )
+        self.conn.execute(self._UPSERT_NODE_SQL, (node_id, node_type, content, path))
         self.conn.commit()
 
+    def upsert_nodes_many(self, rows: list[tuple]) -> None:
+        """Upsert (id, type, content, path) rows. Does not commit — wrap in `with db.conn:`."""
+        self.conn.executemany(self._UPSERT_NODE_SQL, rows)
+
+    def insert_nodes_missing_many(self, rows: list[tuple]) -> None:
+        """Insert (id, type, content, path) rows whose id is not stored yet; existing rows
+        are left untouched. For nodes with fixed content. Does not commit — wrap in `with db.conn:`."""
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO nodes (id, type, content, path) VALUES (?, ?, ?, ?)", rows
+        )
+
+    # Re-indexing a file re-submits every anchor; only rows whose hash, line or status
+    # actually change are written (e.g. after edit(): the edited symbol and those below it)
+    _UPSERT_ANCHOR_SQL = """
+        INSERT INTO anchors (node_id, file_path, symbol_name, ast_hash, start_line, end_line, status)
+        VALUES (?, ?, ?, ?, ?, ?, 'VALID')
+        ON CONFLICT(node_id, file_path, symbol_name) DO UPDATE SET
+            ast_hash = excluded.ast_hash,
+            start_line = excluded.start_line,
+            end_line = excluded.end_line,
+            status = 'VALID'
+        WHERE ast_hash IS NOT excluded.ast_hash
+           OR start_line IS NOT excluded.start_line
+           OR end_line IS NOT excluded.end_line
+           OR status != 'VALID'
+    """
+
     def upsert_anchor(
         self,
         node_id: str,
@@ -138,17 +211,20 @@ class ShadowDB:
         symbol_name: str,
         ast_hash: str,
         start_line: int,
+        end_line: int = None,
     ) -> None:
         self.conn.execute(
-            """
-            INSERT OR REPLACE INTO anchors
-            (node_id, file_path, symbol_name, ast_hash, start_line, status)
-            VALUES (?, ?, ?, ?, ?, 'VALID')
-            """,
-            (node_id, file_path, symbol_name, ast_hash, start_line),
+            self._UPSERT_ANCHOR_SQL, (node_id, file_path, symbol_name, ast_hash, start_line, end_line)
         )
         self.conn.commit()
 
+    def upsert_anchors_many(self, rows: list[tuple]) -> None:
+        """Upsert (node_id, file_path, symbol_name, ast_hash, start_line, end_line) rows as VALID.
+
+        Does not commit — wrap in `with db.conn:`.
+        """
+        self.conn.executemany(self._UPSERT_ANCHOR_SQL, rows)
+
     def add_edge(self, source_id: str, target_id: str, relation: str) -> None:
         self.conn.execute(
             "INSERT OR IGNORE INTO edges (source_id, target_id, relation) VALUES (?, ?, ?)",
@@ -156,6 +232,13 @@ class ShadowDB:
         )
         self.conn.commit()
 
+    def add_edges_many(self, rows: list[tuple]) -> None:
+        """Insert (source_id, target_id, relation) rows. Does not commit — wrap in `with db.conn:`."""
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO edges (source_id, target_id, relation) VALUES (?, ?, ?)",
+            rows,
+        )
+
     def get_anchors_for_file(self, file_path: str) -> list[dict]:
         cursor = self.conn.execute(
             "SELECT * FROM anchors WHERE file_path = ?", (file_path,)
@@ -179,6 +262,16 @@ class ShadowDB:
         )
         self.conn.commit()
 
+    def mark_stale_many(self, rows: list[tuple]) -> None:
+        """Mark (node_id, file_path, symbol_name) anchors stale. Does not commit — wrap in `with db.conn:`."""
+        self.conn.executemany(
+            """
+            UPDATE anchors SET status = 'STALE'
+            WHERE node_id = ? AND file_path = ? AND symbol_name = ?
+            """,
+            rows,
+        )
+
     def get_thoughts_for_symbol(self, file_path: str, symbol_name: str) -> list[dict]:
         cursor = self.conn.execute(
             """
@@ -194,7 +287,7 @@ class ShadowDB:
 
     def get_node(self, node_id: str) -> dict | None:
         cursor = self.conn.execute(
-            "SELECT * FROM nodes WHERE id = ?", (node_id,)
+            f"SELECT {self._NODE_COLUMNS} FROM nodes WHERE id = ?", (node_id,)
         )
         row = cursor.fetchone()
         return dict(row) if row else None
@@ -202,7 +295,7 @@ class ShadowDB:
     def verify_node(self, node_id: str) -> dict | None:
         """Verify a node exists in DB by querying it back (proof of persistence)."""
         cursor = self.conn.execute(
-            "SELECT * FROM nodes WHERE id = ?", (node_id,)
+            f"SELECT {self._NODE_COLUMNS} FROM nodes WHERE id = ?", (node_id,)
         )
         row = cursor.fetchone()
         return dict(row) if row else None
@@ -214,7 +307,7 @@ class ShadowDB:
     def get_folder(self, path: str) -> dict | None:
         """Get folder node by path."""
         cursor = self.conn.execute(
-            "SELECT * FROM nodes WHERE type = 'FOLDER' AND path = ?", (path,)
+            f"SELECT {self._NODE_COLUMNS} FROM nodes WHERE type = 'FOLDER' AND path = ?", (path,)
         )
         row = cursor.fetchone()
         return dict(row) if row else None
@@ -226,8 +319,8 @@ class ShadowDB:
             folder_path += '/'
 
         cursor = self.conn.execute(
-            """
-            SELECT * FROM nodes
+            f"""
+            SELECT {self._NODE_COLUMNS} FROM nodes
             WHERE type = 'CODE_BLOCK' AND path LIKE ?
             ORDER BY path
             """,
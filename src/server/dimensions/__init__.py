@@ -6,11 +6,22 @@ class DimensionProvider(ABC):
 
     query() returns a dict merged into the 'dimensions' key of the recall response.
     Return {} if nothing found — never raise.
+
+    Set db_only = True when query() reads nothing but shadow.db; recall() then
+    caches its results until the database changes.
+
+    query_many() answers several symbols of one file at once (recall(depth=2));
+    override it when the provider can batch the lookups.
     """
 
+    db_only: bool = False
+
     @property
     @abstractmethod
     def name(self) -> str: ...
 
     @abstractmethod
     def query(self, symbol: str, file_path: str | None, opts: dict) -> dict: ...
+
+    def query_many(self, symbols: list[str], file_path: str | None, opts: dict) -> dict[str, dict]:
+        return {symbol: self.query(symbol, file_path, opts) for symbol in symbols}
@@ -1,6 +1,8 @@
 import json
 import os
 import subprocess
+import threading
+from collections import OrderedDict
 from datetime import datetime, timezone
 
 from . import DimensionProvider
@@ -44,6 +46,58 @@ def _find_git_root(start: str) -> str | None:
         current = parent
 
 
+def _head_sha(git_root: str) -> str | None:
+    """Commit HEAD points at, read from .git without spawning git. None when it can't
+    be read this way (worktrees, submodules, unborn branches) — callers then skip caching."""
+    git_dir = os.path.join(git_root, ".git")
+    try:
+        with open(os.path.join(git_dir, "HEAD"), encoding="utf-8") as f:
+            head = f.read().strip()
+        if not head.startswith("ref: "):
+            return head or None  # detached HEAD holds the sha itself
+        ref = head[5:]
+        try:
+            with open(os.path.join(git_dir, ref), encoding="utf-8") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            with open(os.path.join(git_dir, "packed-refs"), encoding="utf-8") as f:
+                for line in f:
+                    sha, _, name = line.strip().partition(" ")
+                    if name == ref:
+                        return sha
+    except OSError:
+        pass
+    return None
+
+
+# git log output keyed by (git_root, HEAD sha, UTC date, args): history only changes
+# with a new commit, and the date keeps relative --since windows honest
+_LOG_CACHE_SIZE = 256
+_log_cache: OrderedDict = OrderedDict()
+_log_cache_lock = threading.Lock()  # recall() runs provider queries on a thread pool
+
+
+def _git_log(args: list[str], git_root: str) -> str:
+    """`git log <args>` in git_root, served from _log_cache while HEAD is unchanged."""
+    head = _head_sha(git_root)
+    if head is None:
+        return _run(["git", "log", *args], cwd=git_root)
+
+    key = (git_root, head, datetime.now(timezone.utc).date(), tuple(args))
+    with _log_cache_lock:
+        raw = _log_cache.get(key)
+        if raw is not None:
+            _log_cache.move_to_end(key)
+            return raw
+    raw = _run(["git", "log", *args], cwd=git_root)
+    if raw:  # empty also means timeout/failure — don't pin that
+        with _log_cache_lock:
+            _log_cache[key] = raw
+            if len(_log_cache) > _LOG_CACHE_SIZE:
+                _log_cache.popitem(last=False)
+    return raw
+
+
 class GitDimension(DimensionProvider):
     """Git history, churn, and authorship.
 
@@ -71,7 +125,9 @@ class GitDimension(DimensionProvider):
             return {"available": False, "reason": "not a git repository"}
 
         try:
-            git_rel = os.path.relpath(abs_path, git_root).replace("\\", "/")
+            git_rel = os.path.relpath(abs_path, git_root)
+            if os.sep != "/":
+                git_rel = git_rel.replace(os.sep, "/")
         except ValueError:
             git_rel = file_path
 
@@ -87,15 +143,14 @@ class GitDimension(DimensionProvider):
 
     def _symbol_history(self, git_root: str, git_rel: str, symbol_name: str) -> dict:
         """Chronological evolution of a single symbol using git log -L :<func>:<file>."""
-        raw = _run(
+        raw = _git_log(
             [
-                "git", "log",
                 "--max-count=20",
                 "--reverse",
                 "--date=short",
                 f"-L:{symbol_name}:{git_rel}",
             ],
-            cwd=git_root,
+            git_root,
         )
         if not raw:
             # Fallback: git doesn't know how to locate the symbol (language not supported)
@@ -147,9 +202,8 @@ class GitDimension(DimensionProvider):
 
     def _file_history(self, git_root: str, git_rel: str, since_days: int) -> dict:
         """Chronological diff history for a whole file."""
-        raw = _run(
+        raw = _git_log(
             [
-                "git", "log",
                 f"--since={since_days} days ago",
                 "--max-count=20",
                 "--reverse",
@@ -160,7 +214,7 @@ class GitDimension(DimensionProvider):
                 "--",
                 git_rel,
             ],
-            cwd=git_root,
+            git_root,
         )
         if not raw:
             return {"history": [], "churn": 0, "authors": []}
@@ -196,15 +250,14 @@ class GitDimension(DimensionProvider):
 
         # One call: structured commit header + touched files.
         # Sentinel prefix "C>" is safe in list-based Popen (no shell interpretation).
-        raw = _run(
+        raw = _git_log(
             [
-                "git", "log",
                 f"--max-count={max_commits}",
                 "--format=C>%h|%ad|%an|%s",
                 "--name-only",
                 "--date=short",
             ],
-            cwd=git_root,
+            git_root,
         )
 
         recent_commits: list[dict] = []
@@ -5,39 +5,58 @@ class KnowledgeDimension(DimensionProvider):
     """Agent-written thoughts, decisions, todos — stored in shadow.db (SQLite)."""
 
     name = "knowledge"
+    db_only = True
 
     def __init__(self, db):
         self._db = db
 
     def query(self, symbol: str, file_path: str | None, opts: dict) -> dict:
+        return self.query_many([symbol], file_path, opts)[symbol]
+
+    def query_many(self, symbols: list[str], file_path: str | None, opts: dict) -> dict[str, dict]:
+        if not symbols:
+            return {}
+        symbols = list(dict.fromkeys(symbols))  # a repeated symbol would double its business rows
         conn = self._db.conn
 
-        # Thoughts linked to this symbol node
-        thoughts = conn.execute(
-            """
-            SELECT n.id, n.content, n.created_at FROM nodes n
-            JOIN edges e ON e.target_id = n.id
-            WHERE e.source_id = ? AND n.type = 'THOUGHT'
-            ORDER BY n.created_at DESC
-            """,
-            (symbol,),
-        ).fetchall()
-
-        # Business-level context (global knowledge)
-        biz = conn.execute(
-            """
-            SELECT n.id, n.content FROM nodes n
-            WHERE n.id LIKE 'business:%' AND n.content LIKE ?
-            LIMIT 5
+        # Thoughts linked to each symbol node, plus business-level context (global
+        # knowledge) matching the symbol's name, for all symbols in one round trip;
+        # `kind` tells the two row sets apart, `symbol` says whom a row belongs to
+        wanted = ", ".join("(?, ?)" for _ in symbols)
+        params = []
+        for symbol in symbols:
+            params += [symbol, f"%{symbol.split(':')[-1]}%"]
+        rows = conn.execute(
+            f"""
+            WITH wanted(symbol, needle) AS (VALUES {wanted})
+            SELECT * FROM (
+                SELECT 'thought' AS kind, e.source_id AS symbol, n.id, n.content, n.created_at
+                FROM edges e JOIN nodes n ON n.id = e.target_id
+                WHERE e.source_id IN (SELECT symbol FROM wanted) AND n.type = 'THOUGHT'
+                UNION ALL
+                SELECT 'business', w.symbol, n.id, n.content, NULL
+                FROM wanted w JOIN nodes n
+                  ON n.type = 'THOUGHT' AND n.id >= 'business:' AND n.id < 'business;'
+                 AND n.content LIKE w.needle
+            )
+            ORDER BY kind = 'business', created_at DESC, id
             """,
-            (f"%{symbol.split(':')[-1]}%",),
-        ).fetchall()
-
-        result = {
-            "thoughts": [{"id": dict(r)["id"], "text": dict(r)["content"], "at": dict(r)["created_at"]} for r in thoughts],
-        }
-        if biz:
-            result["business_context"] = [{"id": dict(r)["id"], "text": dict(r)["content"]} for r in biz]
-        if not thoughts:
-            result["tip"] = "No thoughts yet. Call remember() to attach context."
-        return result
+            params,
+        )
+        thoughts = {symbol: [] for symbol in symbols}
+        biz = {symbol: [] for symbol in symbols}
+        for r in rows:
+            if r["kind"] == "thought":
+                thoughts[r["symbol"]].append({"id": r["id"], "text": r["content"], "at": r["created_at"]})
+            elif len(biz[r["symbol"]]) < 5:
+                biz[r["symbol"]].append({"id": r["id"], "text": r["content"]})
+
+        results = {}
+        for symbol in symbols:
+            result = {"thoughts": thoughts[symbol]}
+            if biz[symbol]:
+                result["business_context"] = biz[symbol]
+            if not thoughts[symbol]:
+                result["tip"] = "No thoughts yet. Call remember() to attach context."
+            results[symbol] = result
+        return results
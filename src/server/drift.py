@@ -2,38 +2,33 @@ from indexer import index_file
 from database import ShadowDB
 
 
-def check_drift(db: ShadowDB, file_path: str) -> list[dict]:
-    """Compare current AST hashes with stored hashes to detect stale notes.
+def diff_anchors(anchors: list[dict], current_symbols: list[dict], file_path: str) -> list[dict]:
+    """Compare stored anchors against freshly indexed symbols of the same file.
 
-    Returns a list of stale anchors with details about what changed.
-    Also updates the anchor status in the database.
+    Returns the stale anchors with details about what changed; each result keeps
+    the anchor's node_id so the caller can mark it. Touches no database.
     """
-    stored_anchors = db.get_anchors_for_file(file_path)
-    if not stored_anchors:
-        return []
-
-    current_symbols = index_file(file_path)
     current_map = {s["symbol_name"]: s for s in current_symbols}
 
     stale_results: list[dict] = []
 
-    for anchor in stored_anchors:
+    for anchor in anchors:
         symbol_name = anchor["symbol_name"]
         current = current_map.get(symbol_name)
 
         if current is None:
-            db.mark_stale(anchor["node_id"], file_path, symbol_name)
             stale_results.append(
                 {
+                    "node_id": anchor["node_id"],
                     "symbol_name": symbol_name,
                     "status": "DELETED",
                     "message": f"Symbol '{symbol_name}' no longer exists in {file_path}",
                 }
             )
         elif current["ast_hash"] != anchor["ast_hash"]:
-            db.mark_stale(anchor["node_id"], file_path, symbol_name)
             stale_results.append(
                 {
+                    "node_id": anchor["node_id"],
                     "symbol_name": symbol_name,
                     "status": "MODIFIED",
                     "old_hash": anchor["ast_hash"],
@@ -43,3 +38,27 @@ def check_drift(db: ShadowDB, file_path: str) -> list[dict]:
             )
 
     return stale_results
+
+
+def check_drift(db: ShadowDB, file_path: str, stored_path: str | None = None) -> list[dict]:
+    """Compare current AST hashes with stored hashes to detect stale notes.
+
+    Returns a list of stale anchors with details about what changed.
+    Also updates the anchor status in the database.
+
+    stored_path is the path the anchors were recorded under, when it differs from
+    the path to read (the server stores workspace-relative paths).
+    """
+    stored_path = stored_path or file_path
+    stored_anchors = db.get_anchors_for_file(stored_path)
+    if not stored_anchors:
+        return []
+
+    try:
+        current_symbols = index_file(file_path)
+    except FileNotFoundError:
+        current_symbols = []  # file deleted: every anchored symbol went with it
+    stale_results = diff_anchors(stored_anchors, current_symbols, stored_path)
+    with db.conn:
+        db.mark_stale_many([(r["node_id"], stored_path, r["symbol_name"]) for r in stale_results])
+    return stale_results
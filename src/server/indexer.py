@@ -1,5 +1,5 @@
+import functools
 import hashlib
-import re
 from pathlib import Path
 
 from tree_sitter_language_pack import get_parser
@@ -33,9 +33,20 @@ SYMBOL_NODE_TYPES: dict[str, list[str]] = {
 }
 
 
+@functools.lru_cache(maxsize=128)
+def _parse(language: str, source_code: bytes):
+    """Parse tree for this exact source. index(), its import pass and check() all
+    read the same unchanged file, so they share one parse. Trees are never edited."""
+    return get_parser(language).parse(source_code)
+
+
 def compute_ast_hash(node_text: str) -> str:
-    """Compute SHA256 of node text stripped of whitespace for formatting-stable hashing."""
-    normalized = re.sub(r"\s+", "", node_text)
+    """Compute SHA256 of node text stripped of whitespace for formatting-stable hashing.
+
+    str.split() drops exactly the characters `\\s` matches, several times faster than
+    re.sub; the digest must stay SHA256 of the same text so stored anchors keep matching.
+    """
+    normalized = "".join(node_text.split())
     return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
 
 
@@ -77,10 +88,7 @@ def extract_imports(file_path: str) -> list[str]:
     if not language:
         return []
 
-    source_code = path.read_bytes()
-    parser = get_parser(language)
-    tree = parser.parse(source_code)
-    root = tree.root_node
+    root = _parse(language, path.read_bytes()).root_node
 
     imports: list[str] = []
 
@@ -124,6 +132,7 @@ def index_file(file_path: str) -> list[dict]:
       - content: the full source text of the symbol
       - ast_hash: SHA256 of whitespace-stripped body
       - start_line: 1-based line number
+      - end_line: 1-based last line of the symbol
     """
     path = Path(file_path)
     ext = path.suffix
@@ -131,10 +140,7 @@ def index_file(file_path: str) -> list[dict]:
     if not language:
         return []
 
-    source_code = path.read_bytes()
-    parser = get_parser(language)
-    tree = parser.parse(source_code)
-    root = tree.root_node
+    root = _parse(language, path.read_bytes()).root_node
 
     symbols: list[dict] = []
     target_types = SYMBOL_NODE_TYPES.get(language, [])
@@ -153,6 +159,7 @@ def index_file(file_path: str) -> list[dict]:
                         "content": content,
                         "ast_hash": ast_hash,
                         "start_line": node.start_point[0] + 1,  # 1-based
+                        "end_line": node.end_point[0] + 1,  # 1-based, inclusive
                     }
                 )
         for child in node.children:
@@ -160,3 +167,23 @@ def index_file(file_path: str) -> list[dict]:
 
     walk(root)
     return symbols
+
+
+def warm_parsers() -> None:
+    """Load every grammar once. Used as a worker-process initializer for batch indexing."""
+    for language in set(LANG_MAP.values()):
+        get_parser(language)
+
+
+def parse_for_index(file_path: str) -> tuple[list[dict], list[str] | None]:
+    """Symbols and imports for one file — the CPU-bound half of index().
+
+    Imports come back as None when extraction fails so the caller can leave the
+    file's existing DEPENDS_ON edges alone. Top-level so it pickles into a worker.
+    """
+    symbols = index_file(file_path)
+    try:
+        imports = extract_imports(file_path)
+    except Exception:
+        imports = None
+    return symbols, imports
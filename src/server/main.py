@@ -1,27 +1,49 @@
+import atexit
+import contextlib
+import functools
 import json
 import os
+import re
 import sys
-import uuid
+import secrets
 import logging
+import multiprocessing
+import time
 import datetime
+from collections import OrderedDict
 
 # CRITICAL: Never write to stdout in MCP mode — stdout is the JSON-RPC channel.
-logging.basicConfig(stream=sys.stderr, level=logging.DEBUG)
+# SHADOW_LOG=debug turns on per-call tracing; INFO keeps stderr quiet by default.
+_log_level = logging.getLevelName(os.environ.get("SHADOW_LOG", "INFO").upper())
+logging.basicConfig(stream=sys.stderr, level=_log_level if isinstance(_log_level, int) else logging.INFO)
 logger = logging.getLogger("shadowgraph")
 
 logger.info("=== ShadowGraph MCP Server Starting ===")
-logger.info(f"Python version: {sys.version.split()[0]}")
+logger.info("Python version: %s", sys.version.split()[0])
 
 # Use absolute imports so the script works both as `python main.py` and `python -m src.server.main`
 sys.path.insert(0, os.path.dirname(__file__))
 from database import ShadowDB  # noqa: E402
-from indexer import index_file as do_index_file, extract_imports  # noqa: E402
-from drift import check_drift as do_check_drift  # noqa: E402
+# indexer and drift load the tree-sitter grammars; they are imported inside the
+# tools that need them so the stdio handshake doesn't wait on them.
 from dimensions.knowledge import KnowledgeDimension  # noqa: E402
 from dimensions.git import GitDimension  # noqa: E402
 
 from mcp.server.fastmcp import FastMCP  # noqa: E402
 
+try:
+    import orjson
+    _ORJSON_AVAILABLE = True
+except ImportError:
+    _ORJSON_AVAILABLE = False
+
+
+def _dumps(obj) -> str:
+    """Encode a tool result. orjson when installed, stdlib json otherwise — same compact output."""
+    if _ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
 # ============================================================================
 # Database initialisation
 # Priority: --db-path CLI arg > SHADOW_DB_PATH env var > default
@@ -34,21 +56,28 @@ if "--db-path" in sys.argv:
         _db_path_from_arg = sys.argv[_idx + 1]
 
 db_path = _db_path_from_arg or os.environ.get("SHADOW_DB_PATH", ".vscode/shadow.db")
-logger.info(f"DB path: {db_path} (source: {'--db-path arg' if _db_path_from_arg else 'env/default'})")
+logger.info("DB path: %s (source: %s)", db_path, "--db-path arg" if _db_path_from_arg else "env/default")
 
 # Workspace root is always two levels above shadow.db: {workspace}/.vscode/shadow.db
 _abs_db_path = os.path.abspath(db_path)
 WORKSPACE_ROOT = os.path.dirname(os.path.dirname(_abs_db_path))
-logger.info(f"Workspace root: {WORKSPACE_ROOT}")
-logger.info(f"cwd: {os.getcwd()}")
-
-try:
-    db = ShadowDB(_abs_db_path)
-    db.connect()
-    logger.info(f"Database connected at: {_abs_db_path}")
-except Exception as e:
-    logger.error(f"CRITICAL: Failed to connect to database: {e}", exc_info=True)
-    raise
+logger.info("Workspace root: %s", WORKSPACE_ROOT)
+logger.info("cwd: %s", os.getcwd())
+
+# Batch-indexing workers re-import the parent's entry script, and with it this file.
+# They only parse, so they must not open the database (a second DuckDB connection
+# would trip its file lock). parent_process() is only set once a worker has
+# bootstrapped; while it re-imports the script, its process name gives it away.
+if multiprocessing.parent_process() is not None or multiprocessing.current_process().name != "MainProcess":
+    db = None
+else:
+    try:
+        db = ShadowDB(_abs_db_path)
+        db.connect()
+        logger.info("Database connected at: %s", _abs_db_path)
+    except Exception as e:
+        logger.error("CRITICAL: Failed to connect to database: %s", e, exc_info=True)
+        raise
 
 mcp = FastMCP("ShadowGraph")
 
@@ -59,33 +88,337 @@ _PROVIDERS = {
 }
 _ALL_DIMENSIONS = list(_PROVIDERS.keys())
 
+# Results of db_only providers, keyed by the DB version they were read at
+_DIMENSION_CACHE_SIZE = 256
+_dimension_cache: OrderedDict = OrderedDict()
+
+
+def _db_version() -> tuple[int, int]:
+    """Changes whenever shadow.db does. data_version moves on commits from other
+    connections (the VS Code client); total_changes counts this connection's writes."""
+    return db.conn.execute("PRAGMA data_version").fetchone()[0], db.conn.total_changes
+
+
+def _query_dimension(dim_name: str, symbol: str, file_path: str | None, opts: dict) -> dict:
+    """provider.query(), served from cache for db_only providers while the DB is unchanged."""
+    provider = _PROVIDERS[dim_name]
+    if not provider.db_only:
+        return provider.query(symbol, file_path, opts)
+
+    key = (_db_version(), dim_name, symbol, file_path, _dumps(opts))
+    data = _dimension_cache.get(key)
+    if data is None:
+        data = provider.query(symbol, file_path, opts)
+        _dimension_cache[key] = data
+        if len(_dimension_cache) > _DIMENSION_CACHE_SIZE:
+            _dimension_cache.popitem(last=False)
+    else:
+        _dimension_cache.move_to_end(key)
+    return dict(data)
+
+
+def _query_dimension_many(dim_name: str, symbols: list[str], file_path: str | None, opts: dict) -> dict[str, dict]:
+    """provider.query_many() with the same caching as `_query_dimension`; only
+    symbols missing from the cache reach the provider, in one call."""
+    provider = _PROVIDERS[dim_name]
+    if not provider.db_only:
+        return provider.query_many(symbols, file_path, opts)
+
+    version, opts_key = _db_version(), _dumps(opts)
+    results = {}
+    missing = []
+    for symbol in symbols:
+        key = (version, dim_name, symbol, file_path, opts_key)
+        data = _dimension_cache.get(key)
+        if data is None:
+            missing.append(symbol)
+        else:
+            _dimension_cache.move_to_end(key)
+            results[symbol] = dict(data)
+    if missing:
+        for symbol, data in provider.query_many(missing, file_path, opts).items():
+            _dimension_cache[(version, dim_name, symbol, file_path, opts_key)] = data
+            results[symbol] = dict(data)
+        while len(_dimension_cache) > _DIMENSION_CACHE_SIZE:
+            _dimension_cache.popitem(last=False)
+    return results
+
+
+_dimension_executor = None
+
+
+def _dimension_task(dim_name: str, fn, *args):
+    """Start fn(*args) for dim_name; returns a callable that yields its result (or raises).
+
+    Providers that aren't db_only (git shells out) start right away on a thread pool,
+    so their waits overlap. db_only ones run when collected, on this thread — the
+    sqlite3 connection can't be used from other threads.
+    """
+    if _PROVIDERS[dim_name].db_only:
+        return functools.partial(fn, *args)
+    global _dimension_executor
+    if _dimension_executor is None:
+        from concurrent.futures import ThreadPoolExecutor
+
+        _dimension_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="dimension")
+    return _dimension_executor.submit(fn, *args).result
+
 
 # ============================================================================
 # Path helpers
 # ============================================================================
 
+@functools.lru_cache(maxsize=4096)
 def _resolve_path(path: str) -> str:
-    """Absolute path — relative paths go relative to WORKSPACE_ROOT, not cwd."""
+    """Absolute path — relative paths go relative to WORKSPACE_ROOT, not cwd.
+
+    Cached like `_to_rel_path`: pure string work on the fixed WORKSPACE_ROOT, no filesystem access.
+    """
     if os.path.isabs(path):
         return path
     return os.path.join(WORKSPACE_ROOT, path)
 
 
+@functools.lru_cache(maxsize=4096)
 def _to_rel_path(path: str) -> str:
-    """Forward-slash path relative to WORKSPACE_ROOT. This is what gets stored in the DB."""
+    """Forward-slash path relative to WORKSPACE_ROOT. This is what gets stored in the DB.
+
+    Cached: the result depends only on `path` and the fixed WORKSPACE_ROOT.
+    """
     abs_path = _resolve_path(path)
     try:
         rel = os.path.relpath(abs_path, WORKSPACE_ROOT)
     except ValueError:
         rel = abs_path  # Different drive on Windows
-    return rel.replace("\\", "/")
+    # On POSIX relpath already uses "/", and a backslash is a legal filename character
+    return rel if os.sep == "/" else rel.replace(os.sep, "/")
+
+
+def _file_id_range(rel_path: str) -> tuple[str, str]:
+    """Bounds of the code node ids in a file: `lo <= id < hi` is an index range seek,
+    where `LIKE 'code:{rel_path}:%'` would scan (LIKE folds case) and treat `_` as a wildcard."""
+    return f"code:{rel_path}:", f"code:{rel_path};"  # ';' sorts right after ':'
+
+
+def _open_creating_dirs(path: str, mode: str):
+    """open() for writing that creates missing parent folders. The folders are only
+    created after the first open fails, so writes into existing folders cost one syscall."""
+    try:
+        return open(path, mode, encoding="utf-8")
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(path) or WORKSPACE_ROOT, exist_ok=True)
+        return open(path, mode, encoding="utf-8")
+
+
+# Matches everything that can start an indexed symbol or an import in the supported
+# languages: the declaration keywords, plus a `) {` / `): T {` method head, since
+# object-literal methods need no keyword (`{ handler(evt) { ... } }`). Content
+# without any of them yields no symbols and no DEPENDS_ON edges.
+_QUICK_SYMBOL_RE = re.compile(r"\b(?:def|class|function|interface|type|enum|const|let|import)\b|\)[^;{]*\{")
+
+
+def _open_tmpfile(folder: str) -> int | None:
+    """Unnamed O_TMPFILE inode in `folder`, or None where the OS/filesystem lacks it."""
+    if not hasattr(os, "O_TMPFILE"):
+        return None
+    try:
+        try:
+            return os.open(folder, os.O_TMPFILE | os.O_WRONLY, 0o666)
+        except FileNotFoundError:
+            os.makedirs(folder, exist_ok=True)
+            return os.open(folder, os.O_TMPFILE | os.O_WRONLY, 0o666)
+    except OSError:
+        return None
+
+
+def _create_exclusive(path: str, content: str) -> None:
+    """Create `path` holding `content`; FileExistsError if it already exists.
+
+    The content is always complete before `path` appears, and link() refuses an
+    existing name just like O_EXCL. On Linux it goes to an unnamed O_TMPFILE inode,
+    so no temp name touches the folder; elsewhere to a sibling temp file that is
+    hard-linked into place. Only where hard links are unsupported (FAT, some network
+    shares) is `path` opened O_EXCL and written in place.
+    """
+    fd = _open_tmpfile(os.path.dirname(path) or WORKSPACE_ROOT)
+    if fd is not None:
+        with open(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+            f.flush()
+            try:
+                os.link(f"/proc/self/fd/{fd}", path, follow_symlinks=True)
+                return
+            except OSError:
+                pass  # exists, no /proc or linkat refused — the temp-file link below sorts them out
+
+    temp_path = f"{path}.{secrets.token_hex(4)}.tmp"
+    try:
+        with _open_creating_dirs(temp_path, "x") as f:
+            f.write(content)
+        try:
+            os.link(temp_path, path)
+            return
+        except OSError as e:
+            if isinstance(e, FileExistsError):
+                raise
+            # no hard links on this filesystem — write in place below
+    finally:
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+
+    with _open_creating_dirs(path, "x") as f:
+        try:
+            f.write(content)
+        except Exception:
+            f.close()
+            os.remove(path)
+            raise
+
+
+# ============================================================================
+# Indexing helpers
+# ============================================================================
+
+# Batch indexing parses in worker processes started by a forkserver: a clean
+# single-threaded process, so no lock held by a server thread (logging, DuckDB, the
+# dimension pool) is inherited mid-use the way a plain fork of this process could.
+# Where forkserver is unavailable (Windows) index_files() parses in-process.
+_POOL_CONTEXT = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else None
+_POOL_MIN_FILES = 4  # below this, worker start-up costs more than it saves
+_index_executor = None
+
+
+def _index_pool():
+    """Lazily started process pool for index_files() and check(), or None where it can't be used."""
+    global _index_executor
+    if _index_executor is None and _POOL_CONTEXT is not None:
+        from concurrent.futures import ProcessPoolExecutor
+        from indexer import warm_parsers
+
+        ctx = multiprocessing.get_context(_POOL_CONTEXT)
+        # The forkserver loads the grammars' module once; workers fork from it
+        ctx.set_forkserver_preload(["indexer"])
+        _index_executor = ProcessPoolExecutor(
+            max_workers=os.cpu_count() or 1,
+            mp_context=ctx,
+            initializer=warm_parsers,
+        )
+        atexit.register(_index_executor.shutdown, wait=False, cancel_futures=True)
+    return _index_executor
+
+
+def _store_index(abs_path: str, symbols: list[dict], imports: list[str] | None) -> dict:
+    """Write one file's parse results. Does not commit — wrap in `with db.conn:`."""
+    relative_path = _to_rel_path(abs_path)
+    logger.info("Indexed %s symbols from %s", len(symbols), relative_path)
+
+    node_rows = []
+    anchor_rows = []
+    for sym in symbols:
+        node_id = f"code:{relative_path}:{sym['symbol_name']}"
+        node_rows.append((node_id, "CODE_BLOCK", sym["content"], None))
+        anchor_rows.append(
+            (node_id, relative_path, sym["symbol_name"], sym["ast_hash"], sym["start_line"], sym["end_line"])
+        )
+
+    # Imports become DEPENDS_ON edges; None means extraction failed
+    if imports is None:
+        logger.warning("Failed to extract imports from %s", relative_path)
+
+    # File and module nodes have fixed content, so they are only inserted when missing
+    file_node_id = f"file:{relative_path}"
+    import_node_rows = []
+    edge_rows = []
+    if imports:
+        import_node_rows.append((file_node_id, "CODE_BLOCK", f"File: {relative_path}", None))
+        for imp in imports:
+            import_node_id = f"module:{imp}"
+            import_node_rows.append((import_node_id, "CODE_BLOCK", f"External module: {imp}", None))
+            edge_rows.append((file_node_id, import_node_id, "DEPENDS_ON"))
+
+    db.upsert_nodes_many(node_rows)
+    db.insert_nodes_missing_many(import_node_rows)
+    db.upsert_anchors_many(anchor_rows)
+    if imports is not None:
+        # Replace the file's import set so removed imports don't leave stale edges
+        db.conn.execute(
+            "DELETE FROM edges WHERE source_id = ? AND relation = 'DEPENDS_ON'",
+            (file_node_id,),
+        )
+    db.add_edges_many(edge_rows)
+
+    return _index_summary(relative_path, [s["symbol_name"] for s in symbols])
+
+
+def _index_summary(relative_path: str, symbol_names: list[str]) -> dict:
+    return {
+        "status": "ok",
+        "file": relative_path,
+        "symbols_indexed": len(symbol_names),
+        "symbols": symbol_names,
+        "tip": f"Use these symbol names with remember() and recall(), e.g. recall('{symbol_names[0]}')" if symbol_names else "No symbols found (empty file or unsupported language).",
+    }
+
+
+# Per file as _index_path() last stored it: (st_mtime_ns, st_size), the DB's
+# data_version at the time, and the symbol names
+_indexed_stats: dict[str, tuple[tuple[int, int], int, list[str]]] = {}
+
+# A stat key can't vouch for a file written within one timestamp tick of when it was
+# read: a same-size write in that tick leaves it unchanged (git's "racily clean"
+# entries). Ticks are up to 2 s on FAT/exFAT, so younger files are never cached.
+_RACY_MTIME_NS = 2_000_000_000
+
+
+def _index_path(abs_path: str, use_cache: bool = True) -> dict:
+    """Parse and store one file. Shared by index() and the tools that write files,
+    which use the result dict directly instead of decoding index()'s JSON.
+
+    A file whose stat is unchanged since it was last stored here, while no other
+    connection has written the DB and its anchors are all still VALID, is not
+    parsed again. Tools that just wrote the file pass use_cache=False.
+    """
+    from indexer import parse_for_index
+
+    read_at = time.time_ns()
+    try:
+        st = os.stat(abs_path)
+        key = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        key = None
+    # data_version moves when the VS Code client or the deserializer commits
+    data_version = _db_version()[0]
+    cached = _indexed_stats.get(abs_path) if use_cache else None
+    if key is not None and cached is not None and cached[:2] == (key, data_version):
+        relative_path = _to_rel_path(abs_path)
+        valid = {
+            r["symbol_name"]
+            for r in db.conn.execute(
+                "SELECT symbol_name FROM anchors WHERE file_path = ? AND status = 'VALID'",
+                (relative_path,),
+            )
+        }
+        if valid.issuperset(cached[2]):
+            return _index_summary(relative_path, list(cached[2]))
+
+    symbols, imports = parse_for_index(abs_path)
+    # One transaction for the whole file: a single commit instead of one per row
+    with db.conn:
+        result = _store_index(abs_path, symbols, imports)
+    if key is not None and key[0] < read_at - _RACY_MTIME_NS:
+        _indexed_stats[abs_path] = (key, data_version, result["symbols"])
+    else:
+        _indexed_stats.pop(abs_path, None)
+    return result
 
 
 # ============================================================================
-# THE 6 TOOLS
+# THE 7 TOOLS
+# Tools already return a JSON string. structured_output=False stops FastMCP from
+# also wrapping it as {"result": "..."} structuredContent, which sent every payload twice.
 # ============================================================================
 
-@mcp.tool()
+@mcp.tool(structured_output=False)
 def remember(
     topic: str,
     context: str,
@@ -106,44 +439,41 @@ def remember(
     Returns {"status":"ok", "thought_id", "linked_to"}.
     linked_to will warn if symbol_name wasn't indexed yet — call index() first in that case.
     """
-    logger.debug(f"remember() topic={topic}, file={file_path}, symbol={symbol_name}")
+    logger.debug("remember() topic=%s, file=%s, symbol=%s", topic, file_path, symbol_name)
 
-    thought_id = f"thought:{uuid.uuid4().hex[:12]}"
-    created_at = datetime.datetime.utcnow().isoformat()
+    thought_id = f"thought:{secrets.token_hex(6)}"
+    created_at = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
 
-    # Store the thought
-    db.upsert_node(thought_id, "THOUGHT", context)
-
-    # Link to a code symbol if given
+    # Link to a code symbol if given — only if it is indexed, otherwise store unlinked
     linked_to = None
     if file_path and symbol_name:
         normalized_path = _to_rel_path(file_path)
         code_node_id = f"code:{normalized_path}:{symbol_name}"
-        try:
-            db.add_edge(code_node_id, thought_id, "HAS_THOUGHT")
+        if db.conn.execute("SELECT 1 FROM nodes WHERE id = ?", (code_node_id,)).fetchone():
             linked_to = code_node_id
-            logger.info(f"Linked thought to {code_node_id}")
-        except Exception as e:
-            if "FOREIGN KEY" in str(e):
-                # Symbol not indexed yet — store business context anyway and warn
-                logger.warning(f"Symbol {code_node_id} not indexed yet. Storing thought unlinked.")
-                linked_to = f"(unlinked — call index({file_path!r}) first to anchor)"
-            else:
-                raise
+            logger.info("Linked thought to %s", code_node_id)
+        else:
+            # Symbol not indexed yet — store business context anyway and warn
+            logger.warning("Symbol %s not indexed yet. Storing thought unlinked.", code_node_id)
+            linked_to = f"(unlinked — call index({file_path!r}) first to anchor)"
 
-    # Always link to the project business context node for global recall
-    project_node_id = "project:business-context"
-    db.upsert_node(project_node_id, "CODE_BLOCK", "Project-level business context and domain knowledge")
+    # The business: id prefix is what makes the topic node show up in global recall
     topic_node_id = f"business:{topic.lower().replace(' ', '-')}"
-    db.upsert_node(topic_node_id, "THOUGHT", f"[{topic}] {context}")
-    try:
-        db.add_edge(project_node_id, topic_node_id, "HAS_THOUGHT")
-        if linked_to and not linked_to.startswith("(unlinked"):
-            db.add_edge(linked_to, topic_node_id, "HAS_THOUGHT")
-    except Exception:
-        pass
-
-    return json.dumps({
+    node_rows = [
+        (thought_id, "THOUGHT", context, None),
+        (topic_node_id, "THOUGHT", f"[{topic}] {context}", None),
+    ]
+    edge_rows = []
+    if linked_to and not linked_to.startswith("(unlinked"):
+        edge_rows.append((linked_to, thought_id, "HAS_THOUGHT"))
+        edge_rows.append((linked_to, topic_node_id, "HAS_THOUGHT"))
+
+    # Thought, topic and links land together in one transaction
+    with db.conn:
+        db.upsert_nodes_many(node_rows)
+        db.add_edges_many(edge_rows)
+
+    return _dumps({
         "status": "ok",
         "thought_id": thought_id,
         "topic": topic,
@@ -152,7 +482,7 @@ def remember(
     })
 
 
-@mcp.tool()
+@mcp.tool(structured_output=False)
 def recall(
     query: str = "",
     dimensions: list[str] = None,
@@ -179,7 +509,7 @@ def recall(
     Returns JSON: {node_id, location, dimensions: {knowledge: {...}, git: {...}}}
     For empty query returns: {business_context: [...], symbols: [...]}
     """
-    logger.debug(f"recall() query={query!r} dimensions={dimensions} depth={depth} filter={filter}")
+    logger.debug("recall() query=%r dimensions=%s depth=%s filter=%s", query, dimensions, depth, filter)
     q = query.strip()
     opts = filter or {}
     requested = dimensions if dimensions is not None else _ALL_DIMENSIONS
@@ -199,10 +529,10 @@ def recall(
                 else:
                     # Fallback: fan-out per indexed file
                     files = [
-                        dict(r)["file_path"]
+                        r["file_path"]
                         for r in db.conn.execute(
                             "SELECT DISTINCT file_path FROM anchors ORDER BY file_path"
-                        ).fetchall()
+                        )
                     ]
                     file_results = []
                     for fp in files:
@@ -213,24 +543,36 @@ def recall(
                         except Exception:
                             pass
                     rollup["dimensions"][dim_name] = file_results
-            return json.dumps(rollup)
-
-        # Default: business context + symbol listing
-        biz = db.conn.execute(
+            return _dumps(rollup)
+
+        # Default: business context + symbol listing, in one round trip; `kind` tells
+        # the two row sets apart. Business topics are the THOUGHT ids under 'business:'
+        # (a range seek on idx_nodes_type_id); the 30 newest symbols come straight off
+        # idx_nodes_type_recent.
+        business_context, symbols = [], []
+        for r in db.conn.execute(
             """
-            SELECT n.id, n.content FROM nodes n
-            WHERE n.type = 'THOUGHT'
-              AND n.id IN (SELECT target_id FROM edges WHERE source_id = 'project:business-context')
-            ORDER BY n.created_at DESC
+            SELECT * FROM (
+                SELECT 'business' AS kind, id, content, created_at FROM nodes
+                WHERE type = 'THOUGHT' AND id >= 'business:' AND id < 'business;'
+                UNION ALL
+                SELECT * FROM (
+                    SELECT 'symbol', id, NULL, created_at FROM nodes
+                    WHERE type = 'CODE_BLOCK' AND id LIKE 'code:%:%'
+                    ORDER BY created_at DESC LIMIT 30
+                )
+            )
+            ORDER BY kind, created_at DESC
             """
-        ).fetchall()
-        syms = db.conn.execute(
-            "SELECT id FROM nodes WHERE type='CODE_BLOCK' AND id LIKE 'code:%:%' ORDER BY created_at DESC LIMIT 30"
-        ).fetchall()
-        return json.dumps({
+        ):
+            if r["kind"] == "business":
+                business_context.append({"id": r["id"], "text": r["content"]})
+            else:
+                symbols.append(r["id"].split(":", 2)[2] + " (" + r["id"] + ")")
+        return _dumps({
             "query": "*",
-            "business_context": [{"id": dict(r)["id"], "text": dict(r)["content"]} for r in biz],
-            "symbols": [dict(r)["id"].split(":", 2)[2] + " (" + dict(r)["id"] + ")" for r in syms],
+            "business_context": business_context,
+            "symbols": symbols,
             "tip": "Pass a symbol name or keyword to get full details across dimensions.",
         })
 
@@ -242,22 +584,24 @@ def recall(
         node_id = q
     else:
         # Try exact symbol match: code:{any_file}:{q}
+        # Seek on the indexed last id segment, then confirm the full pattern on those few rows.
+        # Both sides ignore ASCII case, like the plain LIKE match did.
         row = db.conn.execute(
-            "SELECT id FROM nodes WHERE id LIKE ? AND type='CODE_BLOCK' LIMIT 1",
-            (f"code:%:{q}",),
+            "SELECT id FROM nodes WHERE symbol_suffix = ? COLLATE NOCASE AND type='CODE_BLOCK' AND id LIKE ? LIMIT 1",
+            (q.rsplit(":", 1)[-1], f"code:%:{q}"),
         ).fetchone()
         if row:
-            node_id = dict(row)["id"]
+            node_id = row["id"]
         else:
             # Try as a file path: code:{q}:% — finds any symbol in that file
             rel_q = _to_rel_path(q)
             row = db.conn.execute(
-                "SELECT id FROM nodes WHERE id LIKE ? AND type='CODE_BLOCK' LIMIT 1",
-                (f"code:{rel_q}:%",),
+                "SELECT id FROM nodes WHERE type='CODE_BLOCK' AND id >= ? AND id < ? LIMIT 1",
+                _file_id_range(rel_q),
             ).fetchone()
             if row:
                 # File has indexed symbols — pick one to anchor the result, query at file level
-                node_id = dict(row)["id"]
+                node_id = row["id"]
                 file_path = rel_q  # override: query dimensions for the whole file
             elif "/" in q or q.endswith((".py", ".ts", ".tsx", ".js", ".jsx")):
                 # File path with NO indexed symbols (e.g. procedural scripts) — still query dimensions
@@ -275,10 +619,10 @@ def recall(
         symbols_in_file = []
         if file_path:
             sym_rows = db.conn.execute(
-                "SELECT id FROM nodes WHERE id LIKE ? AND type='CODE_BLOCK'",
-                (f"code:{file_path}:%",),
-            ).fetchall()
-            symbols_in_file = [dict(r)["id"].split(":", 2)[2] for r in sym_rows]
+                "SELECT id FROM nodes WHERE type='CODE_BLOCK' AND id >= ? AND id < ?",
+                _file_id_range(file_path),
+            )
+            symbols_in_file = [r["id"].split(":", 2)[2] for r in sym_rows]
 
         result = {
             "query": q,
@@ -290,61 +634,93 @@ def recall(
         if symbols_in_file:
             result["symbols"] = symbols_in_file
 
-        for dim_name in requested:
-            provider = _PROVIDERS.get(dim_name)
-            if provider:
-                try:
-                    result["dimensions"][dim_name] = provider.query(
-                        node_id or f"file:{file_path}", file_path, opts
-                    )
-                except Exception as e:
-                    logger.warning(f"Dimension {dim_name} failed: {e}")
-                    result["dimensions"][dim_name] = {"error": str(e)}
+        target = node_id or f"file:{file_path}"
+        dims = [d for d in requested if d in _PROVIDERS]
 
         # depth=2: include symbols-level detail when query was at file level
-        if depth >= 2 and file_path and symbols_in_file:
-            result["symbol_details"] = []
-            for sym_id in symbols_in_file[:5]:  # cap at 5 to avoid bloat
-                sym_node_id = f"code:{file_path}:{sym_id}"
-                sym_dims = {}
-                for dim_name in requested:
-                    provider = _PROVIDERS.get(dim_name)
-                    if provider:
-                        try:
-                            sym_dims[dim_name] = provider.query(sym_node_id, file_path, opts)
-                        except Exception:
-                            pass
-                result["symbol_details"].append({"symbol": sym_id, "dimensions": sym_dims})
+        sym_ids = symbols_in_file[:5] if depth >= 2 and file_path else []  # cap at 5 to avoid bloat
+        sym_node_ids = [f"code:{file_path}:{sym_id}" for sym_id in sym_ids]
+        # The fan-out target is usually one of them — reuse its result instead of asking again
+        pending = [i for i in sym_node_ids if i != target]
+
+        # Start every provider call before collecting any. db_only providers answer all
+        # pending symbols in one query_many(); the others get one call per symbol so
+        # their subprocesses run side by side.
+        tasks = {d: _dimension_task(d, _query_dimension, d, target, file_path, opts) for d in dims}
+        sym_tasks = [
+            (d, _dimension_task(d, _query_dimension_many, d, batch, file_path, opts))
+            for d in (dims if pending else [])
+            for batch in ([pending] if _PROVIDERS[d].db_only else [[i] for i in pending])
+        ]
+
+        for dim_name, task in tasks.items():
+            try:
+                result["dimensions"][dim_name] = task()
+            except Exception as e:
+                logger.warning("Dimension %s failed: %s", dim_name, e)
+                result["dimensions"][dim_name] = {"error": str(e)}
+
+        if sym_ids:
+            sym_dims = {sym_node_id: {} for sym_node_id in sym_node_ids}
+            if target in sym_dims:
+                for dim_name, data in result["dimensions"].items():
+                    if "error" not in data:
+                        sym_dims[target][dim_name] = dict(data)
+            for dim_name, task in sym_tasks:
+                try:
+                    per_symbol = task()
+                except Exception:
+                    continue
+                for sym_node_id, data in per_symbol.items():
+                    sym_dims[sym_node_id][dim_name] = data
+            result["symbol_details"] = [
+                {"symbol": sym_id, "dimensions": sym_dims[sym_node_id]}
+                for sym_id, sym_node_id in zip(sym_ids, sym_node_ids)
+            ]
 
-        return json.dumps(result)
+        return _dumps(result)
 
     # ── Keyword fallback ───────────────────────────────────────────────────
+    # One pass over nodes feeds all three lists; stop reading once every list is full.
+    # Code rows only carry a 120-char snippet so whole function bodies aren't copied out.
     like = f"%{q}%"
-    code_rows = db.conn.execute(
-        "SELECT id, content FROM nodes WHERE type='CODE_BLOCK' AND (id LIKE ? OR content LIKE ?) LIMIT 10",
-        (like, like),
-    ).fetchall()
-    thought_rows = db.conn.execute(
-        "SELECT id, content FROM nodes WHERE type='THOUGHT' AND content LIKE ? LIMIT 10",
+    cursor = db.conn.execute(
+        """
+        SELECT * FROM (
+            SELECT id,
+                   CASE WHEN type = 'CODE_BLOCK' THEN substr(content, 1, 120) ELSE content END AS content,
+                   type = 'CODE_BLOCK' AND (id LIKE ?1 OR content LIKE ?1) AS is_code,
+                   type = 'THOUGHT' AND content LIKE ?1 AS is_thought,
+                   id LIKE 'business:%' AND (id LIKE ?1 OR content LIKE ?1) AS is_biz
+            FROM nodes
+        )
+        WHERE is_code OR is_thought OR is_biz
+        """,
         (like,),
-    ).fetchall()
-    biz_rows = db.conn.execute(
-        "SELECT id, content FROM nodes WHERE id LIKE 'business:%' AND (id LIKE ? OR content LIKE ?) LIMIT 5",
-        (like, like),
-    ).fetchall()
+    )
+    code_rows, thought_rows, biz_rows = [], [], []
+    for r in cursor:
+        if r["is_code"] and len(code_rows) < 10:
+            code_rows.append({"id": r["id"], "snippet": r["content"]})
+        if r["is_thought"] and len(thought_rows) < 10:
+            thought_rows.append(r)
+        if r["is_biz"] and len(biz_rows) < 5:
+            biz_rows.append(r)
+        if len(code_rows) == 10 and len(thought_rows) == 10 and len(biz_rows) == 5:
+            break
 
     result = {
         "query": q,
-        "symbols": [{"node_id": dict(r)["id"], "snippet": (dict(r)["content"] or "")[:120]} for r in code_rows],
-        "thoughts": [{"id": dict(r)["id"], "text": dict(r)["content"]} for r in thought_rows],
-        "business_context": [{"id": dict(r)["id"], "text": dict(r)["content"]} for r in biz_rows],
+        "symbols": [{"node_id": r["id"], "snippet": r["snippet"] or ""} for r in code_rows],
+        "thoughts": [{"id": r["id"], "text": r["content"]} for r in thought_rows],
+        "business_context": [{"id": r["id"], "text": r["content"]} for r in biz_rows],
     }
     if not any(result[k] for k in ("symbols", "thoughts", "business_context")):
         result["tip"] = f"Nothing found for '{q}'. Try recall() with no args to see everything indexed."
-    return json.dumps(result)
+    return _dumps(result)
 
 
-@mcp.tool()
+@mcp.tool(structured_output=False)
 def index(file_path: str) -> str:
     """Parse a source file and register all its symbols (functions, classes, interfaces, types, enums).
 
@@ -357,46 +733,93 @@ def index(file_path: str) -> str:
 
     Returns JSON with the indexed symbol names — use these exact strings in remember() and edit().
     """
-    logger.debug(f"index() called with: {file_path}")
-    abs_path = _resolve_path(file_path)
-    symbols = do_index_file(abs_path)
-    relative_path = _to_rel_path(abs_path)
-    logger.info(f"Indexed {len(symbols)} symbols from {relative_path}")
+    logger.debug("index() called with: %s", file_path)
+    return _dumps(_index_path(_resolve_path(file_path)))
 
-    for sym in symbols:
-        node_id = f"code:{relative_path}:{sym['symbol_name']}"
-        db.upsert_node(node_id, "CODE_BLOCK", sym["content"])
-        db.upsert_anchor(
-            node_id,
-            relative_path,
-            sym["symbol_name"],
-            sym["ast_hash"],
-            sym["start_line"],
-        )
 
-    # Extract imports and create DEPENDS_ON edges
-    try:
-        imports = extract_imports(abs_path)
-        for imp in imports:
-            import_node_id = f"module:{imp}"
-            db.upsert_node(import_node_id, "CODE_BLOCK", f"External module: {imp}")
-            file_node_id = f"file:{relative_path}"
-            db.upsert_node(file_node_id, "CODE_BLOCK", f"File: {relative_path}")
-            db.add_edge(file_node_id, import_node_id, "DEPENDS_ON")
-    except Exception as e:
-        logger.warning(f"Failed to extract imports: {e}")
+@mcp.tool(structured_output=False)
+def index_files(file_paths: list[str]) -> str:
+    """Index several files in one call — use after a refactor instead of calling index() per file.
 
-    symbol_names = [s["symbol_name"] for s in symbols]
-    return json.dumps({
-        "status": "ok",
-        "file": relative_path,
-        "symbols_indexed": len(symbols),
-        "symbols": symbol_names,
-        "tip": f"Use these symbol names with remember() and recall(), e.g. recall('{symbol_names[0]}')" if symbol_names else "No symbols found (empty file or unsupported language).",
+    Files are parsed in parallel worker processes; all results are written in a single transaction.
+
+    Args:
+        file_paths: Paths to the files (absolute or relative to project root).
+
+    Returns JSON: {files_indexed, symbols_indexed, files: [{file, symbols_indexed, symbols}], errors}
+    """
+    logger.debug("index_files() called with %s paths", len(file_paths))
+    from indexer import parse_for_index
+
+    abs_paths = [_resolve_path(p) for p in file_paths]
+
+    parsed: list[tuple[str, tuple]] = []
+    errors = []
+    pool = _index_pool() if len(abs_paths) >= _POOL_MIN_FILES else None
+    if pool is not None:
+        futures = [(p, pool.submit(parse_for_index, p)) for p in abs_paths]
+        for abs_path, fut in futures:
+            try:
+                parsed.append((abs_path, fut.result()))
+            except Exception as e:
+                errors.append({"file": _to_rel_path(abs_path), "error": str(e)})
+    else:
+        for abs_path in abs_paths:
+            try:
+                parsed.append((abs_path, parse_for_index(abs_path)))
+            except Exception as e:
+                errors.append({"file": _to_rel_path(abs_path), "error": str(e)})
+
+    with db.conn:
+        files = [_store_index(abs_path, symbols, imports) for abs_path, (symbols, imports) in parsed]
+
+    return _dumps({
+        "status": "ok" if not errors else "partial",
+        "files_indexed": len(files),
+        "symbols_indexed": sum(f["symbols_indexed"] for f in files),
+        "files": [{k: f[k] for k in ("file", "symbols_indexed", "symbols")} for f in files],
+        "errors": errors,
     })
 
 
-@mcp.tool()
+# Symbol hashes per file from the last workspace check(), keyed by abs path and
+# validated by (st_mtime_ns, st_size) — unchanged files are neither read nor parsed.
+# The key is None for files too young to trust it (see _RACY_MTIME_NS).
+_hashes_by_file: dict[str, tuple[tuple[int, int] | None, list[dict]]] = {}
+
+
+def _refresh_hashes(stats: dict[str, os.stat_result]) -> None:
+    """Re-parse the files whose stat changed since the last check() into _hashes_by_file.
+
+    Enough changed files are parsed in the index_files() worker pool. A file that fails
+    to parse is logged and left out of the cache.
+    """
+    from indexer import index_file as do_index_file
+
+    read_at = time.time_ns()
+    changed = {}
+    for abs_path, st in stats.items():
+        key = (st.st_mtime_ns, st.st_size)
+        cached = _hashes_by_file.get(abs_path)
+        if cached is None or cached[0] != key:
+            changed[abs_path] = key
+
+    pool = _index_pool() if len(changed) >= _POOL_MIN_FILES else None
+    futures = {p: pool.submit(do_index_file, p) for p in changed} if pool is not None else {}
+    for abs_path, key in changed.items():
+        _hashes_by_file.pop(abs_path, None)
+        try:
+            symbols = futures[abs_path].result() if futures else do_index_file(abs_path)
+        except Exception as e:
+            logger.warning("check drift failed for %s: %s", abs_path, e)
+            continue
+        _hashes_by_file[abs_path] = (
+            key if key[0] < read_at - _RACY_MTIME_NS else None,
+            [{"symbol_name": s["symbol_name"], "ast_hash": s["ast_hash"]} for s in symbols],
+        )
+
+
+@mcp.tool(structured_output=False)
 def check(file_path: str = None) -> str:
     """Detect symbols whose code changed after their linked thoughts were written.
 
@@ -408,28 +831,56 @@ def check(file_path: str = None) -> str:
 
     Returns JSON: {stale_count, stale_symbols: [{symbol, file, old_hash, new_hash}]}
     """
-    logger.debug(f"check() called, file_path={file_path}")
+    logger.debug("check() called, file_path=%s", file_path)
+    from drift import check_drift as do_check_drift, diff_anchors
 
     if file_path:
         abs_path = _resolve_path(file_path)
-        stale = do_check_drift(db, abs_path)
-        files_checked = [_to_rel_path(abs_path)]
+        rel_path = _to_rel_path(abs_path)
+        # Anchors are stored under the workspace-relative path; the file is read at abs_path
+        stale = do_check_drift(db, abs_path, stored_path=rel_path)
+        for r in stale:
+            r["file"] = rel_path
+        files_checked = [rel_path]
     else:
-        # Check all anchored files
-        cursor = db.conn.execute("SELECT DISTINCT file_path FROM anchors")
+        # Check all anchored files: one anchors query, one parse per file, one commit
+        anchors_by_file: dict[str, list[dict]] = {}
+        for row in db.conn.execute("SELECT * FROM anchors ORDER BY file_path"):
+            anchors_by_file.setdefault(row["file_path"], []).append(dict(row))
+
         files_checked = []
-        stale = []
-        for row in cursor.fetchall():
-            fp = dict(row)["file_path"]
+        stats = {}
+        deleted = set()
+        for fp in anchors_by_file:
             abs_fp = _resolve_path(fp)
-            if os.path.exists(abs_fp):
-                files_checked.append(fp)
-                try:
-                    stale.extend(do_check_drift(db, abs_fp))
-                except Exception as e:
-                    logger.warning(f"check drift failed for {fp}: {e}")
+            try:
+                stats[abs_fp] = os.stat(abs_fp)
+            except FileNotFoundError:
+                deleted.add(fp)
+                _hashes_by_file.pop(abs_fp, None)
+            except OSError:
+                continue
+            files_checked.append(fp)
+        _refresh_hashes(stats)
 
-    return json.dumps({
+        stale = []
+        for fp in files_checked:
+            if fp in deleted:
+                current = []  # every anchored symbol went with the file
+            else:
+                cached = _hashes_by_file.get(_resolve_path(fp))
+                if cached is None:
+                    continue  # failed to parse, already logged
+                current = cached[1]
+            file_stale = diff_anchors(anchors_by_file[fp], current, fp)
+            for r in file_stale:
+                r["file"] = fp
+            stale.extend(file_stale)
+
+        with db.conn:
+            db.mark_stale_many([(r["node_id"], r["file"], r["symbol_name"]) for r in stale])
+
+    return _dumps({
         "status": "ok",
         "files_checked": files_checked,
         "stale_count": len(stale),
@@ -438,7 +889,7 @@ def check(file_path: str = None) -> str:
     })
 
 
-@mcp.tool()
+@mcp.tool(structured_output=False)
 def create_file(path: str, content: str, language: str = "python", overwrite: bool = False) -> str:
     """Write a file to disk and index its symbols. The only tool that touches the filesystem.
 
@@ -454,29 +905,31 @@ def create_file(path: str, content: str, language: str = "python", overwrite: bo
     Returns JSON: {path, symbols_indexed, symbols, verified_node}
     symbols are the indexed names — use them directly in remember() and edit().
     """
-    logger.debug(f"create_file() called for {path}")
+    logger.debug("create_file() called for %s", path)
 
     abs_path = _resolve_path(path)
     rel_path = _to_rel_path(abs_path)
-    logger.debug(f"Absolute: {abs_path}, relative: {rel_path}")
+    logger.debug("Absolute: %s, relative: %s", abs_path, rel_path)
 
     try:
-        if os.path.exists(abs_path) and not overwrite:
-            return json.dumps({"status": "error", "message": f"File already exists: {rel_path}. Pass overwrite=True to replace it, or use edit() to modify a specific symbol."})
-
-        os.makedirs(os.path.dirname(abs_path) or WORKSPACE_ROOT, exist_ok=True)
-
-        # Atomic write
-        temp_path = abs_path + ".tmp"
-        try:
-            with open(temp_path, "w", encoding="utf-8") as f:
-                f.write(content)
-            os.rename(temp_path, abs_path)
-            logger.info(f"File created: {abs_path} ({os.path.getsize(abs_path)} bytes)")
-        except Exception as e:
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            raise e
+        if overwrite:
+            # Atomic replace: readers see the old file or the new one, never a partial write
+            temp_path = abs_path + ".tmp"
+            try:
+                with _open_creating_dirs(temp_path, "w") as f:
+                    f.write(content)
+                os.replace(temp_path, abs_path)
+            except Exception:
+                with contextlib.suppress(OSError):
+                    os.remove(temp_path)
+                raise
+        else:
+            # The exclusive create doubles as the existence check — no separate stat
+            try:
+                _create_exclusive(abs_path, content)
+            except FileExistsError:
+                return _dumps({"status": "error", "message": f"File already exists: {rel_path}. Pass overwrite=True to replace it, or use edit() to modify a specific symbol."})
+        logger.info("File created: %s (%s chars)", abs_path, len(content))
 
         # Auto-index
         supported = {"python", "typescript", "javascript", "jsx", "tsx"}
@@ -484,22 +937,23 @@ def create_file(path: str, content: str, language: str = "python", overwrite: bo
         symbol_names = []
         verified = None
 
-        if language.lower() in supported:
+        # Stubs with no definitions or imports would parse to nothing — skip tree-sitter
+        if language.lower() in supported and _QUICK_SYMBOL_RE.search(content):
             try:
-                index_result = json.loads(index(abs_path))
+                index_result = _index_path(abs_path, use_cache=False)
                 symbols_indexed = index_result.get("symbols_indexed", 0)
                 symbol_names = index_result.get("symbols", [])
                 if symbol_names:
                     verified = db.verify_node(f"code:{rel_path}:{symbol_names[0]}")
             except Exception as e:
-                logger.warning(f"Auto-index failed: {e}")
+                logger.warning("Auto-index failed: %s", e)
 
         if not verified:
             node_id = f"code:{rel_path}"
             db.upsert_node(node_id, "CODE_BLOCK", content[:500], rel_path)
             verified = db.verify_node(node_id)
 
-        return json.dumps({
+        return _dumps({
             "status": "ok",
             "path": rel_path,
             "symbols_indexed": symbols_indexed,
@@ -508,11 +962,11 @@ def create_file(path: str, content: str, language: str = "python", overwrite: bo
             "tip": f"File written and indexed. Use remember() to attach context, e.g. remember('why-this-file', 'explanation', file_path='{rel_path}', symbol_name='{symbol_names[0]}')" if symbol_names else f"File written. Call index('{rel_path}') to index symbols after adding code.",
         })
     except Exception as e:
-        logger.error(f"create_file failed: {e}")
-        return json.dumps({"status": "error", "message": str(e)})
+        logger.error("create_file failed: %s", e)
+        return _dumps({"status": "error", "message": str(e)})
 
 
-@mcp.tool()
+@mcp.tool(structured_output=False)
 def edit(file_path: str, symbol_name: str, thought: str, new_code: str) -> str:
     """Modify an existing symbol's code. Requires explaining WHY before the change is written.
 
@@ -535,24 +989,23 @@ def edit(file_path: str, symbol_name: str, thought: str, new_code: str) -> str:
     Returns JSON: {status, thought_id, new_ast_hash, symbols_reindexed}
     On error: {status:"error", message} with file unchanged.
     """
-    logger.debug(f"edit() file={file_path} symbol={symbol_name}")
+    logger.debug("edit() file=%s symbol=%s", file_path, symbol_name)
 
     abs_path = _resolve_path(file_path)
     rel_path = _to_rel_path(abs_path)
 
     # 1. Verify symbol is indexed
     node_id = f"code:{rel_path}:{symbol_name}"
-    anchor_rows = db.conn.execute(
-        "SELECT start_line, ast_hash FROM anchors WHERE node_id=? AND status='VALID'",
+    anchor = db.conn.execute(
+        "SELECT start_line, end_line, ast_hash FROM anchors WHERE node_id=? AND status='VALID'",
         (node_id,),
-    ).fetchall()
-    if not anchor_rows:
-        return json.dumps({
+    ).fetchone()
+    if anchor is None:
+        return _dumps({
             "status": "error",
             "message": f"Symbol '{symbol_name}' not found in index for {rel_path}. Call index('{rel_path}') first, then recall() to confirm the symbol name.",
         })
 
-    anchor = dict(anchor_rows[0])
     start_line = anchor["start_line"]
 
     # 2. Read file, find the symbol block to replace
@@ -560,68 +1013,65 @@ def edit(file_path: str, symbol_name: str, thought: str, new_code: str) -> str:
         with open(abs_path, "r", encoding="utf-8") as f:
             original = f.read()
     except OSError as e:
-        return json.dumps({"status": "error", "message": f"Cannot read file: {e}"})
+        return _dumps({"status": "error", "message": f"Cannot read file: {e}"})
 
     lines = original.splitlines(keepends=True)
 
     # Find the symbol start line (1-indexed) and determine its extent via indentation
     if start_line < 1 or start_line > len(lines):
-        return json.dumps({"status": "error", "message": f"start_line {start_line} out of range for {rel_path}"})
-
-    # Determine block end: collect lines while indented past the definition line
-    def_indent = len(lines[start_line - 1]) - len(lines[start_line - 1].lstrip())
-    end_line = start_line
-    for i in range(start_line, len(lines)):
-        stripped = lines[i].lstrip()
-        if i == start_line - 1 or not stripped or len(lines[i]) - len(stripped) > def_indent:
-            end_line = i + 1
-        elif i > start_line - 1:
-            break
+        return _dumps({"status": "error", "message": f"start_line {start_line} out of range for {rel_path}"})
+
+    # Block end: the indexer records where tree-sitter ended the symbol. Anchors stored
+    # before that was recorded fall back to collecting lines indented past the definition.
+    end_line = anchor["end_line"]
+    if end_line is None or not start_line <= end_line <= len(lines):
+        def_indent = len(lines[start_line - 1]) - len(lines[start_line - 1].lstrip())
+        end_line = start_line
+        for i in range(start_line, len(lines)):
+            stripped = lines[i].lstrip()
+            if not stripped or len(lines[i]) - len(stripped) > def_indent:
+                end_line = i + 1
+            else:
+                break
 
     # 3. Write thought BEFORE touching the file
-    thought_id = f"thought:{uuid.uuid4().hex[:12]}"
+    thought_id = f"thought:{secrets.token_hex(6)}"
     db.upsert_node(thought_id, "THOUGHT", thought)
     try:
         db.add_edge(node_id, thought_id, "HAS_THOUGHT")
     except Exception as e:
-        logger.warning(f"Could not link thought to node: {e}")
+        logger.warning("Could not link thought to node: %s", e)
 
-    # 4. Atomic file rewrite with rollback
-    backup = abs_path + ".bak"
+    # 4. Atomic file rewrite: head, new code and tail go to a temp file that replaces
+    # the original in one step, so a failed write leaves the original untouched
+    temp_path = abs_path + ".tmp"
     try:
-        with open(backup, "w", encoding="utf-8") as f:
-            f.write(original)
-
-        new_lines = lines[:start_line - 1] + [new_code if new_code.endswith("\n") else new_code + "\n"] + lines[end_line:]
-        temp_path = abs_path + ".tmp"
         with open(temp_path, "w", encoding="utf-8") as f:
-            f.writelines(new_lines)
+            f.writelines(lines[:start_line - 1])
+            f.write(new_code if new_code.endswith("\n") else new_code + "\n")
+            f.writelines(lines[end_line:])
         os.replace(temp_path, abs_path)
-        logger.info(f"edit() wrote {rel_path} (replaced lines {start_line}-{end_line})")
+        logger.info("edit() wrote %s (replaced lines %s-%s)", rel_path, start_line, end_line)
     except Exception as e:
-        # Rollback
-        if os.path.exists(backup):
-            os.replace(backup, abs_path)
-        return json.dumps({"status": "error", "message": f"File write failed, rolled back: {e}"})
-    finally:
-        if os.path.exists(backup):
-            os.remove(backup)
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+        return _dumps({"status": "error", "message": f"File write failed, rolled back: {e}"})
 
     # 5. Re-index to update AST hash
     try:
-        idx = json.loads(index(abs_path))
+        idx = _index_path(abs_path, use_cache=False)
         new_symbols = idx.get("symbols", [])
     except Exception as e:
-        logger.warning(f"Re-index after edit failed: {e}")
+        logger.warning("Re-index after edit failed: %s", e)
         new_symbols = []
 
     # 6. Verify new hash stored
     updated_anchor = db.conn.execute(
         "SELECT ast_hash, status FROM anchors WHERE node_id=?", (node_id,)
     ).fetchone()
-    new_hash = dict(updated_anchor)["ast_hash"] if updated_anchor else None
+    new_hash = updated_anchor["ast_hash"] if updated_anchor else None
 
-    return json.dumps({
+    return _dumps({
         "status": "ok",
         "file": rel_path,
         "symbol": symbol_name,
@@ -633,19 +1083,24 @@ def edit(file_path: str, symbol_name: str, thought: str, new_code: str) -> str:
 
 def debug_info() -> str:
     """Internal diagnostic — not exposed as an MCP tool. Call from CLI: python main.py --cli debug"""
-    node_count = 0
+    node_count = anchor_count = edge_count = 0
     try:
-        node_count = db.conn.execute("SELECT COUNT(*) FROM nodes").fetchone()[0]
+        # One statement for all three tables
+        node_count, anchor_count, edge_count = db.conn.execute(
+            "SELECT (SELECT COUNT(*) FROM nodes), (SELECT COUNT(*) FROM anchors), (SELECT COUNT(*) FROM edges)"
+        ).fetchone()
     except Exception as e:
-        node_count = f"error: {e}"
+        node_count = anchor_count = edge_count = f"error: {e}"
 
-    return json.dumps({
+    return _dumps({
         "status": "ok",
         "workspace_root": WORKSPACE_ROOT,
         "db_path": _abs_db_path,
         "db_exists": os.path.exists(_abs_db_path),
         "db_size_bytes": os.path.getsize(_abs_db_path) if os.path.exists(_abs_db_path) else 0,
         "node_count": node_count,
+        "anchor_count": anchor_count,
+        "edge_count": edge_count,
         "cwd": os.getcwd(),
         "shadow_db_path_env": os.environ.get("SHADOW_DB_PATH", "(not set)"),
     })
@@ -657,22 +1112,34 @@ def debug_info() -> str:
 if __name__ == "__main__":
     if len(sys.argv) > 1 and sys.argv[1] == "--cli":
         if len(sys.argv) < 3:
-            print(json.dumps({"error": "Usage: main.py --cli <command> [args...]"}))
+            print(_dumps({"error": "Usage: main.py --cli <command> [args...]"}))
             sys.exit(1)
+        # command → (handler, number of positional args). index_file / check_drift are
+        # the names the VS Code extension's "Index File" and "Check Drift" commands send.
+        cli_commands = {
+            "index": (index, 1),
+            "index_file": (index, 1),
+            "check": (check, 1),
+            "check_drift": (check, 1),
+            "debug": (debug_info, 0),
+        }
         command = sys.argv[2]
-        if command == "index" and len(sys.argv) > 3:
-            print(index(sys.argv[3]))
-        elif command == "check" and len(sys.argv) > 3:
-            print(check(sys.argv[3]))
-        elif command == "debug":
-            print(debug_info())
-        else:
-            print(json.dumps({"error": f"Unknown command: {command}"}))
+        handler, nargs = cli_commands.get(command, (None, 0))
+        args = sys.argv[3:]
+        if "--db-path" in args:  # already consumed at startup
+            del args[args.index("--db-path"):args.index("--db-path") + 2]
+        args = args[:nargs]
+        if handler is None:
+            print(_dumps({"error": f"Unknown command: {command}"}))
+            sys.exit(1)
+        if len(args) < nargs:
+            print(_dumps({"error": f"Usage: main.py --cli {command} <file_path>"}))
             sys.exit(1)
+        print(handler(*args))
     else:
         try:
             logger.info("Starting MCP stdio transport")
             mcp.run(transport="stdio")
         except Exception as e:
-            logger.error(f"Fatal error: {e}", exc_info=True)
+            logger.error("Fatal error: %s", e, exc_info=True)
             sys.exit(1)
@@ -4,7 +4,11 @@ CREATE TABLE IF NOT EXISTS nodes (
     content TEXT,
     vector BLOB,
     path TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    -- Text after the last ':' of the id ("charge" for code:src/pay.py:function:charge).
+    -- Indexed (NOCASE, like the LIKE match it replaced) so symbol lookups are a seek
+    -- instead of a leading-wildcard LIKE scan.
+    symbol_suffix TEXT GENERATED ALWAYS AS (substr(id, length(rtrim(id, replace(id, ':', ''))) + 1)) VIRTUAL
 );
 
 CREATE TABLE IF NOT EXISTS anchors (
@@ -13,6 +17,9 @@ CREATE TABLE IF NOT EXISTS anchors (
     symbol_name TEXT NOT NULL,
     ast_hash TEXT NOT NULL,
     start_line INTEGER,
+    -- Last line of the symbol (1-based, inclusive) as tree-sitter saw it; NULL for
+    -- anchors stored before it was recorded
+    end_line INTEGER,
     status TEXT NOT NULL DEFAULT 'VALID' CHECK(status IN ('VALID', 'STALE')),
     PRIMARY KEY (node_id, file_path, symbol_name),
     FOREIGN KEY (node_id) REFERENCES nodes(id) ON DELETE CASCADE
@@ -29,10 +36,17 @@ CREATE TABLE IF NOT EXISTS edges (
 
 CREATE INDEX IF NOT EXISTS idx_anchors_file ON anchors(file_path);
 CREATE INDEX IF NOT EXISTS idx_anchors_symbol ON anchors(file_path, symbol_name);
-CREATE INDEX IF NOT EXISTS idx_edges_source ON edges(source_id);
-CREATE INDEX IF NOT EXISTS idx_edges_target ON edges(target_id);
-CREATE INDEX IF NOT EXISTS idx_nodes_type ON nodes(type);
+-- Covering indexes: (endpoint, relation) lookups are answered from the index alone.
+-- Plain source_id lookups use the primary key.
+CREATE INDEX IF NOT EXISTS idx_edges_src_rel ON edges(source_id, relation, target_id);
+CREATE INDEX IF NOT EXISTS idx_edges_tgt_rel ON edges(target_id, relation, source_id);
+-- (type, id) serves id-prefix range seeks within a type; (type, created_at, id) serves
+-- newest-first id listings from the index alone, without a sort step or table reads.
+-- Both also cover plain type filters.
+CREATE INDEX IF NOT EXISTS idx_nodes_type_id ON nodes(type, id);
+CREATE INDEX IF NOT EXISTS idx_nodes_type_recent ON nodes(type, created_at DESC, id);
 CREATE INDEX IF NOT EXISTS idx_nodes_path ON nodes(path);
+CREATE INDEX IF NOT EXISTS idx_nodes_symbol_nocase ON nodes(symbol_suffix COLLATE NOCASE) WHERE type = 'CODE_BLOCK';
 
 -- git_facts: cached git dimension data per file/symbol
 -- Stored in DuckDB (shadow-facts.duckdb) but schema defined here for reference.
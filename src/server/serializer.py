@@ -13,21 +13,47 @@ This format is:
 4. Queryable (can be loaded back into DB)
 """
 
+import hashlib
 import json
+import os
 import sqlite3
+import time
 from pathlib import Path
 from datetime import datetime
 
+_WRITE_BUFFER = 1 << 20
+
+# A stat can't vouch for a file written within one timestamp tick of when it was
+# taken (up to 2 s on FAT/exFAT): a same-size rewrite in that tick leaves it unchanged
+_RACY_MTIME_NS = 2_000_000_000
+
+
+def serialize_database(db_path: str, output_path: str) -> dict:
+    """Export database to JSONL format.
+
+    Skips the rewrite when neither the database files nor the output file changed
+    since the last export; that check is a few stat() calls and never opens the
+    database. The signature lives in a "<output>.sig" sidecar so graph.jsonl
+    itself stays a plain, mergeable list of items.
+
+    Returns {"status": "written" | "cached", "bytes": <output size>}.
+    """
+    read_at = time.time_ns()
+    fingerprint = _db_fingerprint(db_path)
+    sig_path = output_path + ".sig"
+    current = _current_sig(output_path, fingerprint)
+    if current is not None and _read_sig(sig_path) == current:
+        return {"status": "cached", "bytes": os.path.getsize(output_path)}
 
-def serialize_database(db_path: str, output_path: str) -> None:
-    """Export database to JSONL format."""
     conn = sqlite3.connect(db_path)
     conn.row_factory = sqlite3.Row
 
-    with open(output_path, 'w') as f:
+    # Cursors are iterated rather than fetchall()'d so rows stream straight to the
+    # file; a large write buffer keeps that from turning into one write() per line.
+    with open(output_path, 'w', buffering=_WRITE_BUFFER) as f:
         # Export nodes
         cursor = conn.execute("SELECT * FROM nodes ORDER BY id")
-        for row in cursor.fetchall():
+        for row in cursor:
             item = {
                 "type": "node",
                 "id": row["id"],
@@ -41,7 +67,7 @@ def serialize_database(db_path: str, output_path: str) -> None:
         cursor = conn.execute(
             "SELECT * FROM anchors ORDER BY node_id, file_path, symbol_name"
         )
-        for row in cursor.fetchall():
+        for row in cursor:
             item = {
                 "type": "anchor",
                 "node_id": row["node_id"],
@@ -57,7 +83,7 @@ def serialize_database(db_path: str, output_path: str) -> None:
         cursor = conn.execute(
             "SELECT * FROM edges ORDER BY source_id, target_id, relation"
         )
-        for row in cursor.fetchall():
+        for row in cursor:
             item = {
                 "type": "edge",
                 "source_id": row["source_id"],
@@ -68,34 +94,79 @@ def serialize_database(db_path: str, output_path: str) -> None:
 
     conn.close()
 
+    # Database files touched this recently can't be told apart from a same-tick
+    # rewrite, so their signature is left unmatchable and the next call exports again
+    if any(stat is not None and stat[0] >= read_at - _RACY_MTIME_NS for stat in fingerprint):
+        fingerprint = None
+    with open(sig_path, 'w') as f:
+        json.dump(_current_sig(output_path, fingerprint), f)
+    return {"status": "written", "bytes": os.path.getsize(output_path)}
+
+
+def _db_fingerprint(db_path: str) -> list:
+    """[mtime_ns, size] of the database file and its WAL (None where absent).
+
+    Every commit appends to the WAL and every checkpoint rewrites the database
+    file, so unchanged stats mean unchanged contents.
+    """
+    fingerprint = []
+    for path in (db_path, db_path + "-wal"):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            fingerprint.append(None)
+        else:
+            fingerprint.append([st.st_mtime_ns, st.st_size])
+    return fingerprint
+
+
+def _current_sig(output_path: str, fingerprint: list | None) -> dict | None:
+    """Signature of an export: the database files' stats plus the output file's."""
+    try:
+        st = os.stat(output_path)
+    except OSError:
+        return None
+    return {"db": fingerprint, "mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+
+def _read_sig(sig_path: str) -> dict | None:
+    try:
+        with open(sig_path) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
 
 def get_database_checksum(db_path: str) -> str:
     """Compute deterministic checksum of database state for conflict detection."""
-    import hashlib
-
     conn = sqlite3.connect(db_path)
     conn.row_factory = sqlite3.Row
+    try:
+        return _checksum(conn)
+    finally:
+        conn.close()
 
+
+def _checksum(conn: sqlite3.Connection) -> str:
     hasher = hashlib.sha256()
 
     # Hash nodes (deterministic order)
     cursor = conn.execute("SELECT id, type, content, created_at FROM nodes ORDER BY id")
-    for row in cursor.fetchall():
+    for row in cursor:
         hasher.update(f"{row['id']}|{row['type']}|{row['content']}|{row['created_at']}".encode())
 
     # Hash anchors
     cursor = conn.execute(
-        "SELECT node_id, file_path, symbol_name, ast_hash, status FROM anchors ORDER BY node_id, file_path, symbol_name"
+        "SELECT node_id, file_path, symbol_name, ast_hash, start_line, status FROM anchors ORDER BY node_id, file_path, symbol_name"
     )
-    for row in cursor.fetchall():
-        hasher.update(f"{row['node_id']}|{row['file_path']}|{row['symbol_name']}|{row['ast_hash']}|{row['status']}".encode())
+    for row in cursor:
+        hasher.update(f"{row['node_id']}|{row['file_path']}|{row['symbol_name']}|{row['ast_hash']}|{row['start_line']}|{row['status']}".encode())
 
     # Hash edges
     cursor = conn.execute(
         "SELECT source_id, target_id, relation FROM edges ORDER BY source_id, target_id, relation"
     )
-    for row in cursor.fetchall():
+    for row in cursor:
         hasher.update(f"{row['source_id']}|{row['target_id']}|{row['relation']}".encode())
 
-    conn.close()
     return hasher.hexdigest()
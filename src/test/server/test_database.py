@@ -68,6 +68,143 @@ def test_add_edge_and_get_thoughts(tmp_db: ShadowDB):
     assert thoughts[0]["content"] == "This function greets the world"
 
 
+def test_upsert_node_keeps_edges(tmp_db: ShadowDB):
+    """Re-upserting a node (e.g. on re-index) must not cascade-delete its edges."""
+    tmp_db.upsert_node("code:test.py:function:hello", "CODE_BLOCK", "def hello(): pass")
+    tmp_db.upsert_anchor(
+        "code:test.py:function:hello", "test.py", "function:hello", "abc123", 1
+    )
+    tmp_db.upsert_node("thought:001", "THOUGHT", "This function greets the world")
+    tmp_db.add_edge("code:test.py:function:hello", "thought:001", "HAS_THOUGHT")
+
+    tmp_db.upsert_node("code:test.py:function:hello", "CODE_BLOCK", "def hello(): return 1")
+
+    assert tmp_db.get_node("code:test.py:function:hello")["content"] == "def hello(): return 1"
+    assert len(tmp_db.get_anchors_for_file("test.py")) == 1
+    assert len(tmp_db.get_thoughts_for_symbol("test.py", "function:hello")) == 1
+
+
+def test_batch_writes_in_one_transaction(tmp_db: ShadowDB):
+    """The *_many helpers write all rows and commit with the surrounding block."""
+    with tmp_db.conn:
+        tmp_db.upsert_nodes_many([
+            ("code:a.py:function:f", "CODE_BLOCK", "def f(): pass", None),
+            ("code:a.py:function:g", "CODE_BLOCK", "def g(): pass", None),
+            ("module:os", "CODE_BLOCK", "External module: os", None),
+        ])
+        tmp_db.upsert_anchors_many([
+            ("code:a.py:function:f", "a.py", "function:f", "h1", 1, 2),
+            ("code:a.py:function:g", "a.py", "function:g", "h2", 4, 5),
+        ])
+        tmp_db.add_edges_many([
+            ("code:a.py:function:f", "module:os", "DEPENDS_ON"),
+            ("code:a.py:function:f", "module:os", "DEPENDS_ON"),
+        ])
+
+    assert {a["symbol_name"] for a in tmp_db.get_anchors_for_file("a.py")} == {"function:f", "function:g"}
+    edges = tmp_db.conn.execute("SELECT COUNT(*) FROM edges").fetchone()[0]
+    assert edges == 1
+
+
+def test_upsert_anchors_skips_unchanged_rows(tmp_db: ShadowDB):
+    """Re-submitting an identical anchor writes nothing; a changed or STALE one is rewritten."""
+    tmp_db.upsert_node("code:a.py:function:f", "CODE_BLOCK", "def f(): pass")
+    tmp_db.upsert_node("code:a.py:function:g", "CODE_BLOCK", "def g(): pass")
+    rows = [
+        ("code:a.py:function:f", "a.py", "function:f", "h1", 1, 2),
+        ("code:a.py:function:g", "a.py", "function:g", "h2", 4, 5),
+    ]
+    with tmp_db.conn:
+        tmp_db.upsert_anchors_many(rows)
+
+    before = tmp_db.conn.total_changes
+    with tmp_db.conn:
+        tmp_db.upsert_anchors_many(rows)
+    assert tmp_db.conn.total_changes == before
+
+    tmp_db.mark_stale("code:a.py:function:g", "a.py", "function:g")
+    before = tmp_db.conn.total_changes
+    with tmp_db.conn:
+        tmp_db.upsert_anchors_many([rows[0], ("code:a.py:function:g", "a.py", "function:g", "h2", 4, 5)])
+    assert tmp_db.conn.total_changes == before + 1
+    assert {a["status"] for a in tmp_db.get_anchors_for_file("a.py")} == {"VALID"}
+
+
+def test_insert_nodes_missing_leaves_existing_rows(tmp_db: ShadowDB):
+    """insert_nodes_missing_many adds new ids and does not rewrite stored ones."""
+    tmp_db.upsert_node("module:os", "CODE_BLOCK", "External module: os")
+    with tmp_db.conn:
+        tmp_db.insert_nodes_missing_many([
+            ("module:os", "CODE_BLOCK", "changed", None),
+            ("module:re", "CODE_BLOCK", "External module: re", None),
+        ])
+
+    assert tmp_db.get_node("module:os")["content"] == "External module: os"
+    assert tmp_db.get_node("module:re")["content"] == "External module: re"
+
+
+def test_edge_relation_lookup_uses_covering_index(tmp_db: ShadowDB):
+    """(source_id, relation) edge lookups are served from idx_edges_src_rel alone."""
+    plan = tmp_db.conn.execute(
+        "EXPLAIN QUERY PLAN SELECT target_id FROM edges WHERE source_id = ? AND relation = ?",
+        ("code:a.py:function:f", "REQUIRED_BY"),
+    ).fetchall()
+    assert any("COVERING INDEX idx_edges_src_rel" in row[3] for row in plan)
+
+
+def test_symbol_suffix_is_indexed_last_id_segment(tmp_db: ShadowDB):
+    """symbol_suffix holds the text after the last ':' and backs an index seek."""
+    tmp_db.upsert_node("code:src/pay.py:function:charge", "CODE_BLOCK", "def charge(): pass")
+    row = tmp_db.conn.execute(
+        "SELECT symbol_suffix FROM nodes WHERE id = ?", ("code:src/pay.py:function:charge",)
+    ).fetchone()
+    assert row["symbol_suffix"] == "charge"
+
+    plan = tmp_db.conn.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM nodes WHERE symbol_suffix = ? COLLATE NOCASE AND type = 'CODE_BLOCK'",
+        ("charge",),
+    ).fetchall()
+    assert any("idx_nodes_symbol_nocase" in row[3] for row in plan)
+
+
+def test_node_getters_hide_symbol_suffix(tmp_db: ShadowDB):
+    """The generated symbol_suffix column stays out of the node dicts tools return."""
+    tmp_db.upsert_node("code:src/pay.py:function:charge", "CODE_BLOCK", "def charge(): pass", "src/pay.py")
+    tmp_db.create_folder("folder:src", "src")
+    columns = {"id", "type", "content", "vector", "path", "created_at"}
+
+    assert set(tmp_db.get_node("code:src/pay.py:function:charge")) == columns
+    assert set(tmp_db.verify_node("code:src/pay.py:function:charge")) == columns
+    assert set(tmp_db.get_folder("src")) == columns
+    assert [set(n) for n in tmp_db.list_folder_contents("src")] == [columns]
+
+
+def test_symbol_suffix_lookup_ignores_case(tmp_db: ShadowDB):
+    """recall()'s symbol seek matches regardless of case, as the LIKE it replaced did."""
+    tmp_db.upsert_node("code:a.py:function:parseConfig", "CODE_BLOCK", "def parseConfig(): pass")
+    row = tmp_db.conn.execute(
+        "SELECT id FROM nodes WHERE symbol_suffix = ? COLLATE NOCASE AND type='CODE_BLOCK' AND id LIKE ? LIMIT 1",
+        ("parseconfig", "code:%:function:parseconfig"),
+    ).fetchone()
+    assert row["id"] == "code:a.py:function:parseConfig"
+
+
+def test_recall_node_lookups_use_type_indexes(tmp_db: ShadowDB):
+    """Per-file id ranges and the newest-first symbol listing are index searches, not scans."""
+    plan = tmp_db.conn.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM nodes WHERE type = 'CODE_BLOCK' AND id >= ? AND id < ?",
+        ("code:a.py:", "code:a.py;"),
+    ).fetchall()
+    assert any("idx_nodes_type_id (type=? AND id>? AND id<?)" in row[3] for row in plan)
+
+    plan = tmp_db.conn.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM nodes WHERE type = 'CODE_BLOCK' "
+        "AND id LIKE 'code:%:%' ORDER BY created_at DESC LIMIT 30"
+    ).fetchall()
+    assert any("COVERING INDEX idx_nodes_type_recent" in row[3] for row in plan)
+    assert not any("TEMP B-TREE" in row[3] for row in plan)
+
+
 def test_get_thoughts_empty(tmp_db: ShadowDB):
     """Test that querying thoughts for nonexistent symbol returns empty."""
     thoughts = tmp_db.get_thoughts_for_symbol("nonexistent.py", "function:foo")
@@ -109,6 +246,10 @@ def test_migration_adds_path_column(tmp_db: ShadowDB):
     columns = {row[1] for row in cursor.fetchall()}
     assert "path" in columns
 
+    # Generated columns only show up in table_xinfo
+    cursor = tmp_db.conn.execute("PRAGMA table_xinfo(nodes)")
+    assert "symbol_suffix" in {row[1] for row in cursor.fetchall()}
+
     # Verify we can now insert with path
     tmp_db.upsert_node("test-with-path", "CODE_BLOCK", "test content", "src/test.py")
     node = tmp_db.get_node("test-with-path")
@@ -18,6 +18,8 @@ import os
 import sqlite3
 import sys
 import shutil
+import subprocess
+import time
 
 import pytest
 
@@ -308,3 +310,420 @@ def test_e2e_full_chain():
     check_res = json.loads(server.check(file_path=file_path))
     print("check:", json.dumps(check_res, indent=2))
     assert check_res["status"] == "ok"
+
+
+# ============================================================================
+# TEST 7: Tool payload is sent once — as text, without structuredContent
+# ============================================================================
+
+def test_e2e_tool_result_not_duplicated():
+    """FastMCP must not echo the JSON string back as {"result": ...} structuredContent."""
+    import asyncio
+
+    server = load_server()
+
+    result = asyncio.run(server.mcp.call_tool("recall", {"query": ""}))
+
+    assert isinstance(result, list), \
+        "call_tool returned (content, structured) — payload is duplicated on the wire"
+    assert len(result) == 1
+    assert json.loads(result[0].text)["query"] == "*"
+
+
+# ============================================================================
+# TEST 8: index_files() — batch parse, every file stored
+# ============================================================================
+
+def test_e2e_index_files_batch():
+    server = load_server()
+
+    os.makedirs(TEST_SCRATCH_DIR, exist_ok=True)
+    paths = []
+    for i in range(5):
+        rel = f"_e2e_test_scratch/batch_{i}.py"
+        with open(os.path.join(PROJECT_ROOT, rel), "w") as f:
+            f.write(f"import os\n\ndef func_{i}():\n    pass\n")
+        paths.append(rel)
+    paths.append("_e2e_test_scratch/missing.py")
+
+    result = json.loads(server.index_files(file_paths=paths))
+    print("\nindex_files:", json.dumps(result, indent=2))
+
+    assert result["status"] == "partial"
+    assert result["files_indexed"] == 5
+    assert result["symbols_indexed"] == 5
+    assert [e["file"] for e in result["errors"]] == ["_e2e_test_scratch/missing.py"]
+
+    conn = raw_db()
+    for i in range(5):
+        row = conn.execute(
+            "SELECT 1 FROM anchors WHERE node_id = ?",
+            (f"code:_e2e_test_scratch/batch_{i}.py:function:func_{i}",),
+        ).fetchone()
+        assert row is not None, f"batch_{i}.py not stored"
+    close_raw_db(conn)
+
+
+# ============================================================================
+# TEST 9: recall() knowledge cache is invalidated by writes
+# ============================================================================
+
+def test_e2e_recall_cache_sees_new_thoughts():
+    server = load_server()
+
+    file_path = "_e2e_test_scratch/cached.py"
+    server.create_file(path=file_path, content="def cached():\n    pass\n", language="python")
+    node_id = "code:_e2e_test_scratch/cached.py:function:cached"
+
+    def thoughts():
+        res = json.loads(server.recall(node_id, dimensions=["knowledge"]))
+        return [t["text"] for t in res["dimensions"]["knowledge"]["thoughts"]]
+
+    assert thoughts() == []
+    assert thoughts() == []  # second call is served from cache
+
+    server.remember(
+        topic="e2e-cache", context="e2e cache invalidation",
+        file_path=file_path, symbol_name="function:cached",
+    )
+    assert "e2e cache invalidation" in thoughts()
+
+
+# ============================================================================
+# TEST 10: create_file() refuses to clobber unless overwrite=True
+# ============================================================================
+
+def test_e2e_create_file_exclusive_and_overwrite():
+    server = load_server()
+
+    file_path = "_e2e_test_scratch/new_dir/once.py"
+    abs_path = os.path.join(PROJECT_ROOT, file_path)
+
+    first = json.loads(server.create_file(path=file_path, content="def one():\n    pass\n"))
+    assert first["status"] == "ok"
+
+    again = json.loads(server.create_file(path=file_path, content="def two():\n    pass\n"))
+    assert again["status"] == "error"
+    assert "already exists" in again["message"]
+    with open(abs_path) as f:
+        assert "def one" in f.read()
+
+    replaced = json.loads(server.create_file(path=file_path, content="def two():\n    pass\n", overwrite=True))
+    assert replaced["status"] == "ok"
+    assert replaced["symbols"] == ["function:two"]
+    with open(abs_path) as f:
+        assert "def two" in f.read()
+    assert not os.path.exists(abs_path + ".tmp")
+
+
+# ============================================================================
+# TEST 11: check() sees drift on a file indexed by its workspace-relative path
+# ============================================================================
+
+def test_e2e_check_detects_modified_symbol():
+    server = load_server()
+
+    file_path = "_e2e_test_scratch/drifting.py"
+    abs_path = os.path.join(PROJECT_ROOT, file_path)
+    server.create_file(path=file_path, content="def greet():\n    return 'hello'\n")
+
+    with open(abs_path, "w") as f:
+        f.write("def greet():\n    return 'goodbye'\n")
+
+    single = json.loads(server.check(file_path=file_path))
+    assert single["stale_count"] == 1
+    assert single["stale_symbols"][0]["status"] == "MODIFIED"
+    assert single["stale_symbols"][0]["file"] == file_path
+
+    everything = json.loads(server.check())
+    assert file_path in everything["files_checked"]
+    assert any(s["file"] == file_path for s in everything["stale_symbols"])
+
+    conn = raw_db()
+    row = conn.execute(
+        "SELECT status FROM anchors WHERE node_id = ?",
+        (f"code:{file_path}:function:greet",),
+    ).fetchone()
+    close_raw_db(conn)
+    assert row["status"] == "STALE"
+
+
+# ============================================================================
+# TEST 12: a workspace check() re-reads files that changed since the last one
+# ============================================================================
+
+def test_e2e_check_all_sees_edits_between_runs():
+    server = load_server()
+
+    file_path = "_e2e_test_scratch/rechecked.py"
+    abs_path = os.path.join(PROJECT_ROOT, file_path)
+    server.create_file(path=file_path, content="def greet():\n    return 'hi'\n")
+
+    first = json.loads(server.check())
+    assert file_path in first["files_checked"]
+    assert not any(s["file"] == file_path for s in first["stale_symbols"])
+
+    # Same length, different body: only the mtime tells the two versions apart
+    with open(abs_path, "w") as f:
+        f.write("def greet():\n    return 'yo'\n")
+    st = os.stat(abs_path)
+    os.utime(abs_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+    second = json.loads(server.check())
+    assert any(
+        s["file"] == file_path and s["status"] == "MODIFIED" for s in second["stale_symbols"]
+    )
+
+
+# ============================================================================
+# TEST 13: recall(depth=2) attributes batched knowledge to the right symbols
+# ============================================================================
+
+def test_e2e_recall_depth2_symbol_details():
+    server = load_server()
+
+    file_path = "_e2e_test_scratch/detailed.py"
+    server.create_file(
+        path=file_path,
+        content="def alpha():\n    pass\n\ndef beta():\n    pass\n",
+        language="python",
+    )
+    server.remember(
+        topic="e2e-depth", context="e2e alpha note",
+        file_path=file_path, symbol_name="function:alpha",
+    )
+
+    res = json.loads(server.recall(file_path, dimensions=["knowledge"], depth=2))
+    details = {d["symbol"]: d["dimensions"]["knowledge"] for d in res["symbol_details"]}
+    assert "e2e alpha note" in [t["text"] for t in details["function:alpha"]["thoughts"]]
+    assert details["function:beta"]["thoughts"] == []
+
+
+# ============================================================================
+# TEST 14: edit() swaps one symbol in place and leaves no scratch files behind
+# ============================================================================
+
+def test_e2e_edit_replaces_symbol_only():
+    server = load_server()
+
+    file_path = "_e2e_test_scratch/edited.py"
+    abs_path = os.path.join(PROJECT_ROOT, file_path)
+    server.create_file(
+        path=file_path,
+        content="def keep():\n    return 1\n\ndef change():\n    return 2\n\ndef tail():\n    return 3\n",
+        language="python",
+    )
+
+    result = json.loads(server.edit(
+        file_path=file_path, symbol_name="function:change",
+        thought="e2e edit", new_code="def change():\n    return 20",
+    ))
+    assert result["status"] == "ok"
+
+    with open(abs_path) as f:
+        content = f.read()
+    assert content == "def keep():\n    return 1\n\ndef change():\n    return 20\n\ndef tail():\n    return 3\n"
+    assert not os.path.exists(abs_path + ".tmp")
+    assert not os.path.exists(abs_path + ".bak")
+
+
+# ============================================================================
+# TEST 15: index() of an unchanged file still repairs anchors marked STALE
+# ============================================================================
+
+def test_e2e_reindex_unchanged_file_revalidates_stale_anchor():
+    server = load_server()
+
+    file_path = "_e2e_test_scratch/unchanged.py"
+    server.create_file(path=file_path, content="def same():\n    return 1\n", language="python")
+    node_id = f"code:{file_path}:function:same"
+    # Files written moments ago are never cached; backdate it so index() may skip the parse
+    abs_path = os.path.join(PROJECT_ROOT, file_path)
+    os.utime(abs_path, (time.time() - 3600, time.time() - 3600))
+
+    again = json.loads(server.index(file_path))
+    assert again["symbols"] == ["function:same"]
+
+    server.db.mark_stale(node_id, file_path, "function:same")
+    repaired = json.loads(server.index(file_path))
+    assert repaired["symbols"] == ["function:same"]
+
+    conn = raw_db()
+    row = conn.execute("SELECT status FROM anchors WHERE node_id = ?", (node_id,)).fetchone()
+    close_raw_db(conn)
+    assert row["status"] == "VALID"
+
+
+# ============================================================================
+# TEST 16: create_file() indexes keyword-less object-literal methods
+# ============================================================================
+
+def test_e2e_create_file_indexes_object_literal_method():
+    server = load_server()
+
+    file_path = "_e2e_test_scratch/handlers.js"
+    content = "module.exports = {\n  handler(evt) {\n    return evt;\n  },\n};\n"
+
+    result = json.loads(server.create_file(path=file_path, content=content, language="javascript", overwrite=True))
+    assert result["symbols"] == ["function:handler"]
+    assert result["verified_node"] is not None
+
+
+# ============================================================================
+# TEST 17: check() reports every symbol of a deleted file as DELETED
+# ============================================================================
+
+def test_e2e_check_reports_deleted_file():
+    server = load_server()
+
+    file_path = "_e2e_test_scratch/gone.py"
+    server.create_file(path=file_path, content="def soon_gone():\n    return 1\n", language="python", overwrite=True)
+    node_id = f"code:{file_path}:function:soon_gone"
+    os.remove(os.path.join(PROJECT_ROOT, file_path))
+
+    workspace = json.loads(server.check())
+    assert file_path in workspace["files_checked"]
+    assert any(r["node_id"] == node_id and r["status"] == "DELETED" for r in workspace["stale_symbols"])
+
+    conn = raw_db()
+    row = conn.execute("SELECT status FROM anchors WHERE node_id = ?", (node_id,)).fetchone()
+    close_raw_db(conn)
+    assert row["status"] == "STALE"
+
+    single = json.loads(server.check(file_path))
+    assert [(r["symbol_name"], r["status"]) for r in single["stale_symbols"]] == [("function:soon_gone", "DELETED")]
+
+
+# ============================================================================
+# TEST 18: index() re-parses a same-size rewrite within the same mtime tick
+# ============================================================================
+
+def test_e2e_reindex_racy_same_size_write():
+    server = load_server()
+
+    file_path = "_e2e_test_scratch/racy.py"
+    abs_path = os.path.join(PROJECT_ROOT, file_path)
+    server.create_file(path=file_path, content="def racy():\n    return 1\n", language="python", overwrite=True)
+    first = json.loads(server.index(file_path))
+    st = os.stat(abs_path)
+
+    # Same size, same mtime — what a coarse-timestamp filesystem shows for a quick rewrite
+    with open(abs_path, "w") as f:
+        f.write("def racy():\n    return 2\n")
+    os.utime(abs_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    json.loads(server.index(file_path))
+
+    conn = raw_db()
+    row = conn.execute("SELECT content FROM nodes WHERE id = ?", (f"code:{file_path}:function:racy",)).fetchone()
+    close_raw_db(conn)
+    assert first["symbols"] == ["function:racy"]
+    assert "return 2" in row["content"]
+
+
+# ============================================================================
+# TEST 19: a workspace check() re-reads a same-size rewrite within the same mtime tick
+# ============================================================================
+
+def test_e2e_check_all_sees_racy_same_size_write():
+    server = load_server()
+
+    file_path = "_e2e_test_scratch/racy_check.py"
+    abs_path = os.path.join(PROJECT_ROOT, file_path)
+    server.create_file(path=file_path, content="def tick():\n    return 1\n", overwrite=True)
+    server.check()
+    st = os.stat(abs_path)
+
+    # Same size, same mtime — what a coarse-timestamp filesystem shows for a quick rewrite
+    with open(abs_path, "w") as f:
+        f.write("def tick():\n    return 2\n")
+    os.utime(abs_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+    again = json.loads(server.check())
+    assert any(
+        s["file"] == file_path and s["status"] == "MODIFIED" for s in again["stale_symbols"]
+    )
+
+
+# ============================================================================
+# TEST 20: index_files() worker pool works when main is imported by another script
+# ============================================================================
+
+def test_e2e_index_files_pool_from_importing_script(tmp_path):
+    (tmp_path / ".vscode").mkdir()
+    for i in range(5):
+        (tmp_path / f"mod_{i}.py").write_text(f"def func_{i}():\n    pass\n")
+    # Workers re-import the entry script, and main with it — they must not open the DB
+    driver = tmp_path / "driver.py"
+    driver.write_text(
+        "import sys\n"
+        f"sys.path.insert(0, {os.path.abspath(SERVER_DIR)!r})\n"
+        "import main\n"
+        "\n"
+        "if __name__ == '__main__':\n"
+        "    print(main.index_files(file_paths=[f'mod_{i}.py' for i in range(5)]))\n"
+    )
+
+    env = dict(os.environ, SHADOW_DB_PATH=str(tmp_path / ".vscode" / "shadow.db"))
+    proc = subprocess.run(
+        [sys.executable, str(driver)], cwd=tmp_path, env=env,
+        capture_output=True, text=True, timeout=120,
+    )
+    assert proc.returncode == 0, proc.stderr
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    assert result["status"] == "ok", result["errors"]
+    assert result["files_indexed"] == 5
+
+
+# ============================================================================
+# TEST 21: without O_TMPFILE, a failed create_file() leaves no partial file behind
+# ============================================================================
+
+def test_e2e_create_file_fallback_never_half_written(monkeypatch):
+    server = load_server()
+    monkeypatch.setattr(server, "_open_tmpfile", lambda folder: None)  # as on macOS/Windows
+
+    file_path = "_e2e_test_scratch/fallback/partial.py"
+    folder = os.path.join(PROJECT_ROOT, "_e2e_test_scratch", "fallback")
+
+    # A lone surrogate can't be encoded, so the write fails part-way through; with
+    # os.remove disabled no cleanup runs, as if the process had died right there
+    with monkeypatch.context() as m:
+        m.setattr(os, "remove", lambda path: None)
+        failed = json.loads(server.create_file(path=file_path, content="def a():\n    pass\n\ud800\n"))
+    assert failed["status"] == "error"
+    assert not os.path.exists(os.path.join(folder, "partial.py"))
+    for leftover in os.listdir(folder):
+        os.remove(os.path.join(folder, leftover))
+
+    ok = json.loads(server.create_file(path=file_path, content="def a():\n    pass\n"))
+    assert ok["status"] == "ok"
+    assert os.listdir(folder) == ["partial.py"]
+
+
+# ============================================================================
+# TEST 22: without O_TMPFILE, create_file() still creates folders and refuses to clobber
+# ============================================================================
+
+def test_e2e_create_file_fallback_folders_and_exclusive(monkeypatch):
+    server = load_server()
+    monkeypatch.setattr(server, "_open_tmpfile", lambda folder: None)
+
+    file_path = "_e2e_test_scratch/fresh/deeper/once.py"
+    folder = os.path.join(PROJECT_ROOT, "_e2e_test_scratch", "fresh", "deeper")
+
+    first = json.loads(server.create_file(path=file_path, content="def one():\n    pass\n"))
+    assert first["status"] == "ok"
+    again = json.loads(server.create_file(path=file_path, content="def two():\n    pass\n"))
+    assert "already exists" in again["message"]
+    assert os.listdir(folder) == ["once.py"]
+    with open(os.path.join(folder, "once.py")) as f:
+        assert "def one" in f.read()
+
+    # Filesystems without hard links fall back to writing in place
+    def no_links(src, dst, **kwargs):
+        raise PermissionError("hard links not supported")
+
+    monkeypatch.setattr(os, "link", no_links)
+    linkless = json.loads(server.create_file(path="_e2e_test_scratch/fresh/linkless.py", content="def three():\n    pass\n"))
+    assert linkless["symbols"] == ["function:three"]
+    assert sorted(os.listdir(os.path.dirname(folder))) == ["deeper", "linkless.py"]
@@ -19,6 +19,13 @@ def test_index_python_start_lines(sample_python_file):
     assert by_name["function:bar"]["start_line"] == 9
 
 
+def test_index_python_end_lines(sample_python_file):
+    """end_line is the symbol's last line (1-based, inclusive)."""
+    symbols = index_file(sample_python_file)
+    for s in symbols:
+        assert s["end_line"] == s["start_line"] + s["content"].count("\n")
+
+
 def test_index_typescript_file(sample_typescript_file):
     """Test that indexing a TypeScript file extracts functions and classes."""
     symbols = index_file(sample_typescript_file)
@@ -55,3 +62,30 @@ def test_hash_changes_on_code_change():
     code1 = "def hello():\n    return 'world'"
     code2 = "def hello():\n    return 'universe'"
     assert compute_ast_hash(code1) != compute_ast_hash(code2)
+
+
+def test_parse_is_shared_until_content_changes(tmp_path):
+    """index_file and extract_imports reuse one parse; an edit invalidates it."""
+    from indexer import _parse, extract_imports
+
+    f = tmp_path / "mod.py"
+    f.write_text("import os\n\ndef a():\n    pass\n")
+    _parse.cache_clear()
+
+    index_file(str(f))
+    extract_imports(str(f))
+    assert _parse.cache_info().misses == 1
+    assert _parse.cache_info().hits == 1
+
+    f.write_text("import os\n\ndef a():\n    return 1\n")
+    symbols = index_file(str(f))
+    assert _parse.cache_info().misses == 2
+    assert "return 1" in symbols[0]["content"]
+
+
+def test_hash_is_sha256_of_whitespace_free_text():
+    """Stored anchors depend on the exact digest: SHA256 of the text with all whitespace removed."""
+    import hashlib
+
+    code = "def f(a,\tb):\n    return a + b\n"
+    assert compute_ast_hash(code) == hashlib.sha256("deff(a,b):returna+b".encode()).hexdigest()
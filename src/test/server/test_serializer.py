@@ -3,8 +3,10 @@
 import json
 import os
 import tempfile
+import time
 import pytest
 
+import serializer
 from database import ShadowDB
 from serializer import serialize_database, get_database_checksum
 from deserializer import deserialize_database, detect_jsonl_conflicts
@@ -97,6 +99,75 @@ def test_serialize_with_edges(temp_db):
     assert edge_lines[0]["relation"] == "HAS_THOUGHT"
 
 
+def _backdate_db_files(db_path: str) -> None:
+    """Age the database files past the racily-clean window, as if last written a while ago."""
+    an_hour_ago = time.time() - 3600
+    for path in (db_path, db_path + "-wal"):
+        if os.path.exists(path):
+            os.utime(path, (an_hour_ago, an_hour_ago))
+
+
+def test_serialize_skips_rewrite_when_unchanged(temp_db):
+    """Re-serializing an unchanged database leaves the JSONL untouched."""
+    db, tmpdir = temp_db
+    db.upsert_node("node1", "CODE_BLOCK", "def foo(): pass")
+    _backdate_db_files(db.db_path)
+    output = os.path.join(tmpdir, "graph.jsonl")
+
+    assert serialize_database(db.db_path, output)["status"] == "written"
+    mtime = os.stat(output).st_mtime_ns
+
+    result = serialize_database(db.db_path, output)
+    assert result["status"] == "cached"
+    assert result["bytes"] == os.path.getsize(output)
+    assert os.stat(output).st_mtime_ns == mtime
+
+
+def test_serialize_cached_call_does_not_open_database(temp_db, monkeypatch):
+    """The unchanged check is stat-only: a cached export never reads the tables."""
+    db, tmpdir = temp_db
+    db.upsert_node("node1", "CODE_BLOCK", "def foo(): pass")
+    _backdate_db_files(db.db_path)
+    output = os.path.join(tmpdir, "graph.jsonl")
+    serialize_database(db.db_path, output)
+
+    def no_connect(*args, **kwargs):
+        raise AssertionError("cached export opened the database")
+
+    monkeypatch.setattr(serializer.sqlite3, "connect", no_connect)
+    assert serialize_database(db.db_path, output)["status"] == "cached"
+
+
+def test_serialize_rewrites_after_recent_write(temp_db):
+    """A database written moments before the export is exported again next time."""
+    db, tmpdir = temp_db
+    db.upsert_node("node1", "CODE_BLOCK", "def foo(): pass")
+    output = os.path.join(tmpdir, "graph.jsonl")
+
+    assert serialize_database(db.db_path, output)["status"] == "written"
+    assert serialize_database(db.db_path, output)["status"] == "written"
+
+
+def test_serialize_rewrites_after_change(temp_db):
+    """A DB write or an edited output file both force a fresh export."""
+    db, tmpdir = temp_db
+    db.upsert_node("node1", "CODE_BLOCK", "def foo(): pass")
+    _backdate_db_files(db.db_path)
+    output = os.path.join(tmpdir, "graph.jsonl")
+    serialize_database(db.db_path, output)
+
+    db.upsert_node("node2", "THOUGHT", "New thought")
+    assert serialize_database(db.db_path, output)["status"] == "written"
+
+    _backdate_db_files(db.db_path)
+    serialize_database(db.db_path, output)
+    with open(output, "w") as f:
+        f.write("")
+    assert serialize_database(db.db_path, output)["status"] == "written"
+    with open(output) as f:
+        assert len([line for line in f if line.strip()]) == 2
+
+
 def test_deserialize_creates_nodes(temp_db):
     """Deserialize JSONL creates nodes in database."""
     db, tmpdir = temp_db
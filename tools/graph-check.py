@@ -17,6 +17,7 @@ Exit codes:
 import json
 import sys
 import argparse
+from collections import defaultdict
 from pathlib import Path
 
 # Add parent directory to path to import ShadowGraph modules
@@ -93,11 +94,14 @@ Examples:
     severity_rank = {'info': 0, 'warning': 1, 'error': 2, 'critical': 3}
     fail_on_rank = severity_rank.get(args.fail_on, 3)
 
-    # Filter violations
-    violations_to_report = [
-        v for v in all_violations
-        if severity_rank.get(v.get('severity', 'info'), 0) >= fail_on_rank
-    ]
+    # Filter violations and bucket them by severity in a single pass
+    by_severity = defaultdict(list)
+    violations_to_report = []
+    for v in all_violations:
+        severity = v.get('severity', 'info')
+        by_severity[severity].append(v)
+        if severity_rank.get(severity, 0) >= fail_on_rank:
+            violations_to_report.append(v)
 
     # Output results
     if args.json:
@@ -106,6 +110,7 @@ Examples:
             'total_violations': len(all_violations),
             'violations_reported': len(violations_to_report),
             'fail_on_severity': args.fail_on,
+            'severity_counts': {severity: len(bucket) for severity, bucket in by_severity.items()},
             'violations': all_violations if args.verbose else violations_to_report,
         }
         print(json.dumps(output, indent=2))
@@ -123,10 +128,7 @@ Examples:
 
         # Group by severity
         for severity in ['critical', 'error', 'warning', 'info']:
-            severity_violations = [
-                v for v in all_violations
-                if v.get('severity') == severity
-            ]
+            severity_violations = by_severity.get(severity)
             if severity_violations:
                 print(f'{severity.upper()}:')
                 for v in severity_violations: